@@ -0,0 +1,20 @@
+''' Cost of repeated Config[section][key] lookups for a plain value and
+a ListConfigOption with an element type.
+'''
+import timeit
+
+from tek.config import Config, ListConfigOption
+
+
+def main(number=200000):
+    Config.clear()
+    Config.register_config('bench', 'sec', plain='value',
+                           items=ListConfigOption('1,2,3,4,5,6,7,8',
+                                                  element_type=int))
+    for key in ('plain', 'items'):
+        usec = timeit.timeit(lambda: Config['sec'][key],
+                             number=number) / number * 1e6
+        print('{:>6s}: {:.3f} us/lookup'.format(key, usec))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+''' Cost of Config.parse_cli for many sections with many options, for the
+first call, which builds the ArgumentParser, and for later calls, and of
+selecting a single section as a subcommand.
+'''
+import sys
+import time
+
+from tek.config import Config, ListConfigOption
+
+sections = 50
+options = 60
+
+
+def register():
+    Config.clear()
+    for i in range(sections):
+        values = dict(('sec{}_key{}'.format(i, j), 'value')
+                      for j in range(options // 2))
+        values.update(('sec{}_list{}'.format(i, j), ListConfigOption([]))
+                      for j in range(options // 2))
+        Config.register_config('bench', 'sec{}'.format(i), **values)
+
+
+def timed(func, number=1):
+    start = time.perf_counter()
+    for i in range(number):
+        func()
+    return (time.perf_counter() - start) / number * 1000
+
+
+def main(number=20):
+    register()
+    sys.argv = ['bench', '--sec0-key0', 'cli']
+    print('{} options'.format(sections * options))
+    print('first parse_cli : {:.1f}ms'.format(timed(Config.parse_cli)))
+    print('later parse_cli : {:.1f}ms'.format(timed(Config.parse_cli,
+                                                    number)))
+    register()
+    sys.argv = ['bench', 'sec0', '--sec0-key0', 'cli']
+    parse = lambda: Config.parse_cli(subcommands=True)
+    print('first subcommand: {:.1f}ms'.format(timed(parse)))
+    print('later subcommand: {:.1f}ms'.format(timed(parse, number)))
+
+if __name__ == '__main__':
+    main()
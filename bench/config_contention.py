@@ -0,0 +1,53 @@
+''' Throughput of concurrent readers of a section while a writer
+periodically calls Config.override, and a consistency check: the writer
+always sets both keys to the same value, so every snapshot must contain
+equal values.
+'''
+import time
+import threading
+
+from tek.config import Config
+
+readers = 8
+duration = 2.
+write_interval = 0.001
+
+
+def main():
+    Config.clear()
+    Config.register_config('bench', 'sec', key1=0, key2=0,
+                           **dict(('k{}'.format(i), i) for i in range(1000)))
+    running = True
+    reads = [0] * readers
+    inconsistent = [0] * readers
+    writes = [0]
+
+    def read(i):
+        while running:
+            snap = Config.snapshot('sec')
+            if snap['key1'] != snap['key2']:
+                inconsistent[i] += 1
+            Config['sec']['k5']
+            reads[i] += 3
+
+    def write():
+        n = 0
+        while running:
+            n += 1
+            Config.override('sec', key1=n, key2=n)
+            writes[0] += 1
+            time.sleep(write_interval)
+    threads = [threading.Thread(target=read, args=(i,))
+               for i in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    running = False
+    for thread in threads:
+        thread.join()
+    print('{} readers: {:.0f} reads/s, {} writes, {} inconsistent'.format(
+        readers, sum(reads) / duration, writes[0], sum(inconsistent)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+''' Memory held by many sections of typed options, with values in the
+defaults, file, cli and overridden layers and all options resolved.
+'''
+import gc
+import tracemalloc
+from argparse import Namespace
+
+from tek.config import Config, ListConfigOption, IntConfigOption
+
+sections = 100
+options = 200
+
+
+def populate():
+    Config.clear()
+    for i in range(sections):
+        section = 'sec{}'.format(i)
+        defaults = dict()
+        for j in range(options // 2):
+            defaults['int{}'.format(j)] = IntConfigOption(j, help='an int')
+            defaults['list{}'.format(j)] = ListConfigOption(['a'],
+                                                            help='a list')
+        Config.register_config('bench', section, **defaults)
+        config = Config._configs[section]
+        config.set_file_config(dict(('int{}'.format(j), str(j + 1))
+                                    for j in range(options // 2)))
+        config.set_cli_config(Namespace(**dict(
+            ('list{}'.format(j), 'b,c') for j in range(options // 4))))
+        Config.override(section, **dict(('int{}'.format(j), j + 2)
+                                        for j in range(options // 4)))
+        config.config
+
+
+def main():
+    gc.collect()
+    tracemalloc.start()
+    populate()
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{} options: {:.1f}MB held, {:.1f}MB peak, {:.0f} bytes/option'
+          .format(sections * options, size / 1e6, peak / 1e6,
+                  size / (sections * options)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+''' Cost of a single Configuration.override call and the following
+lookup for sections of growing size.
+'''
+import timeit
+
+from tek.config import Configuration
+
+
+def section(size):
+    return dict(('key{}'.format(i), i) for i in range(size))
+
+
+def override_cost(size, number=2000):
+    config = Configuration(section(size))
+
+    def run():
+        config.override(key0=1)
+        config['key0']
+    return timeit.timeit(run, number=number) / number
+
+
+def main():
+    for size in (10, 100, 1000, 10000):
+        usec = override_cost(size) * 1e6
+        print('{:>6d} keys: {:8.2f} us/override'.format(size, usec))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+''' Startup time of Config.setup for a package tree with many config
+modules, without the state cache and with a warm one.
+Each measurement runs in a fresh interpreter.
+'''
+import os
+import sys
+import tempfile
+import subprocess
+
+modules = 200
+keys = 20
+
+config_module = '''
+metadata = {{'parents': ['tek']}}
+
+
+def reset_config():
+    return {{'sec{0}': dict(('key{{}}'.format(i), i) for i in range({1}))}}
+'''
+
+runner = '''
+import sys, time
+start = time.perf_counter()
+from tek.config import Config
+Config.cache_file = {cache!r}
+Config.setup(*['pkg{{}}'.format(i) for i in range({modules})], files=False)
+Config['sec0']['key0']
+print(time.perf_counter() - start)
+'''
+
+
+def create_tree(root):
+    for i in range(modules):
+        pkg = os.path.join(root, 'pkg{}'.format(i))
+        os.mkdir(pkg)
+        open(os.path.join(pkg, '__init__.py'), 'w').close()
+        with open(os.path.join(pkg, 'config.py'), 'w') as f:
+            f.write(config_module.format(i, keys))
+
+
+def run(root, cache):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([root] + sys.path)
+    code = runner.format(cache=cache, modules=modules)
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+    return float(out)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        create_tree(root)
+        cache = os.path.join(root, 'config.cache')
+        print('no cache: {:.3f}s'.format(run(root, None)))
+        print('cold:     {:.3f}s'.format(run(root, cache)))
+        print('warm:     {:.3f}s'.format(run(root, cache)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+''' Startup of a pool of spawned worker processes that need the
+configuration of a package tree with many config modules, running
+Config.setup in each worker versus installing the state exported by the
+parent with Config.import_state.
+'''
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+
+from tek.config import Config
+
+from bench.config_startup import create_tree, modules
+
+workers = int(os.environ.get('BENCH_WORKERS', 64))
+
+
+def names():
+    return ['pkg{}'.format(i) for i in range(modules)]
+
+
+init_time = None
+
+
+def timed(initializer, *args):
+    global init_time
+    start = time.perf_counter()
+    initializer(*args)
+    init_time = time.perf_counter() - start
+
+
+def setup_worker(root):
+    sys.path.insert(0, root)
+    Config.setup(*names(), files=False)
+
+
+def task(_):
+    Config['sec0']['key0']
+    return init_time
+
+
+def run(initializer, initargs):
+    ''' Return the wall time until all workers have completed a task and
+    the mean time spent in the initializer.
+    '''
+    context = multiprocessing.get_context('spawn')
+    start = time.perf_counter()
+    with context.Pool(workers, timed, (initializer,) + initargs) as pool:
+        times = pool.map(task, range(workers), chunksize=1)
+    return time.perf_counter() - start, 1000 * sum(times) / len(times)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        create_tree(root)
+        sys.path.insert(0, root)
+        os.environ['PYTHONPATH'] = os.pathsep.join(sys.path)
+        fmt = '{}: {:.2f}s total, {:.1f}ms per worker initialization'
+        print(fmt.format('setup ', *run(setup_worker, (root,))))
+        Config.setup(*names(), files=False)
+        data = Config.export_state()
+        print(fmt.format('import', *run(Config.import_state, (data,))))
+        print('exported state: {} bytes'.format(len(data)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+''' Throughput of parallel_map for many short blocking calls, compared to
+the previous implementation that started one thread per element.
+'''
+import time
+import threading
+import functools
+
+from tek.tools import parallel_map
+
+elements = 10000
+
+
+class _WrapThread(threading.Thread):
+
+    def __init__(self, function):
+        threading.Thread.__init__(self)
+        self._function = function
+        self.result = None
+
+    def run(self):
+        self.result = self._function()
+
+
+def thread_per_element(func, *a):
+    partials = [functools.partial(func, *args) for args in zip(*a)]
+    threads = list(map(_WrapThread, partials))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [thread.result for thread in threads]
+
+
+def work(value):
+    time.sleep(0.001)
+    return value
+
+
+def timed(name, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print('{:>28s}: {:.2f}s, {:.0f} calls/s'.format(name, elapsed,
+                                                    elements / elapsed))
+
+
+def main():
+    values = range(elements)
+    timed('thread per element', lambda: thread_per_element(work, values))
+    for workers, chunksize in [(32, 1), (64, 1), (64, 16)]:
+        name = '{} workers, chunks of {}'.format(workers, chunksize)
+        timed(name, lambda: parallel_map(work, values, workers=workers,
+                                         chunksize=chunksize))
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,42 @@
 import re
 import os
+import sys
+import time
 import configparser
 import importlib
 import copy
+import functools
+import itertools
+import weakref
+import threading
+import contextvars
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
 
 from tek.config.options import (ConfigOption, TypedConfigOption,
-                                BoolConfigOption)
+                                BoolConfigOption, option_type)
 from tek import logger
-from tek.tools import camelcaseify, find
 from tek.config.errors import (NoSuchSectionError, NoSuchOptionError,
                                ConfigClientNotYetConnectedError,
                                ConfigLoadError)
 from tek.util.decorator import lazy_property
+from tek.config.files import parse_config_file, file_stat
+
+# values set by Configuration.scoped in the current thread or task, as
+# dicts by Configuration
+_scoped_overrides = contextvars.ContextVar('scoped_overrides', default=None)
+
+# list collecting the names of the sections created by the reset_config
+# function running in the current context, see Configurations.reset
+_created_sections = contextvars.ContextVar('created_sections', default=None)
+
+
+def _scoped_values(config):
+    ''' Return the scoped override values of config in the current
+    context, or None.
+    '''
+    scopes = _scoped_overrides.get()
+    return None if scopes is None else scopes.get(config)
 
 
 class ConfigDict(dict):
@@ -34,16 +59,16 @@ class ConfigDict(dict):
             If one would be overwritten, call its set() method instead.
             If the new value also is a TypedConfigOption, pass its value
             to set().
-            If the key is new, try to create a TypedConfigOption.
+            If the key is new, try to create a TypedConfigOption, using
+            the class registered for the value's type with
+            register_option_type.
         '''
         if key not in self:
             if not (isinstance(value, str) or
                     isinstance(value, TypedConfigOption) or
                     value is None):
-                try:
-                    name = value.__class__.__name__
-                    typ = eval(camelcaseify(name) + 'ConfigOption')
-                except NameError:
+                typ = option_type(type(value))
+                if typ is None:
                     value = TypedConfigOption(type(value), value)
                 else:
                     value = typ(value)
@@ -63,39 +88,155 @@ class ConfigDict(dict):
             self[key] = value
 
 
+class ConfigAccessor(object):
+    ''' Precompiled lookup of one key in a Configuration.
+    The effective value is computed once per version of the
+    Configuration, so repeated reads cost a version comparison.
+    The cached value is shared between callers and must not be
+    modified.
+    Values from Configuration.scoped take precedence over the cache.
+    '''
+
+    def __init__(self, config, key):
+        self._config = config
+        self.key = key
+        self._state = -1, None
+
+    def __call__(self):
+        scopes = _scoped_overrides.get()
+        if scopes is not None:
+            values = scopes.get(self._config)
+            if values is not None and self.key in values:
+                return values[self.key]
+        version, value = self._state
+        snapshot = self._config._snapshot
+        if snapshot.version != version:
+            value = snapshot[self.key]
+            self._state = snapshot.version, value
+        return value
+
+
+class ConfigSnapshot(object):
+    ''' Immutable view of the layers of a Configuration at one version.
+    Since layers are never modified after they have been published in a
+    snapshot, lookups need no locking and are consistent across keys.
+    '''
+
+    def __init__(self, config, version, layers):
+        self._config = config
+        self.version = version
+        self.layers = layers
+
+    def __getitem__(self, key):
+        value = self.option(key)
+        if isinstance(value, TypedConfigOption):
+            value = value.effective_value
+        return value
+
+    def __contains__(self, key):
+        return any(key in layer for layer in self.layers)
+
+    def keys(self):
+        ''' All option names, in the order of their first appearance in
+        the layers.
+        '''
+        return list(dict.fromkeys(itertools.chain(*self.layers)))
+
+    def option(self, key):
+        ''' Return the merged option for key, which must not be
+        modified.
+        '''
+        return self._config._option(key, self)
+
+    def resolve(self, key):
+        ''' Merge the values for key from all layers in the order
+        defaults->file->env->cli->overridden.
+        TypedConfigOptions are copied before being merged into, so the
+        layers stay untouched.
+        '''
+        merged = ConfigDict()
+        for layer in self.layers:
+            if key in layer:
+                value = dict.__getitem__(layer, key)
+                if (isinstance(value, TypedConfigOption) and
+                        not isinstance(dict.get(merged, key),
+                                       TypedConfigOption)):
+                    value = copy.copy(value)
+                merged[key] = value
+        if key not in merged:
+            raise NoSuchOptionError(key)
+        return dict.__getitem__(merged, key)
+
+
 class Configuration(object):
     ''' Container for several dictionaries representing configuration
     options from various sources:
     - The defaults, to be set from a Configurations.register_config call
     - The file config, read from all files given in a call to
       Configurations.register_files
+    - The environment config, passed by Configurations.set_env_config
     - The command line options, passed by a CLIConfig object through
       Configurations.set_cli_config
     - Values set by Configurations.override, mainly for testing purposes
     It can be used from ConfigClient subclasses or instances to
     obtain the value to a config key, where the precedence is
-    overridden->cli->files->defaults.
+    overridden->cli->env->files->defaults.
     Different section names can be used for groups of options from the
     register_config call, which correspond to the section names from the
     files.
+    Writers replace the layers they modify with updated copies and
+    publish them as a new ConfigSnapshot, which readers use without
+    locking.
     '''
 
     def __init__(self, defaults):
-        ''' Initialize the dicts used to store the config and the list
-        of section names that are added for defaults.
+        ''' Initialize the dicts used to store the config layers and
+        the cache of merged options.
         '''
         self.config_defaults = ConfigDict()
-        self.config_from_file = dict()
+        self.config_from_file = ConfigDict()
+        self.config_from_env = ConfigDict()
         self.config_from_cli = ConfigDict()
         self.overridden = ConfigDict()
-        self.config = ConfigDict()
+        self._init_state()
         self.set_defaults(defaults)
 
+    def _init_state(self):
+        self._lock = threading.RLock()
+        # merged options by key, with the version they were resolved at
+        self._resolved = dict()
+        # the version at which each key has last been modified
+        self._modified = dict()
+        self._snapshot = ConfigSnapshot(self, 0, self.layers)
+        # ConfigAccessors by key, created by successful lookups
+        self._accessors = dict()
+        # the changed keys and copied layers of the running batch()
+        self._batch = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ['_lock', '_resolved', '_modified', '_snapshot',
+                     '_accessors', '_batch']:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
     def __getitem__(self, key):
         ''' Emulate read-only container behaviour. '''
-        if key not in self.config:
-            raise NoSuchOptionError(key)
-        return self.config.getitem(key)
+        try:
+            accessor = self._accessors[key]
+        except KeyError:
+            if self.stats is None:
+                accessor = ConfigAccessor(self, key)
+            else:
+                accessor = self.stats.accessor(self, key)
+            value = accessor()
+            self._accessors[key] = accessor
+            return value
+        return accessor()
 
     def __str__(self):
         return str(self.config)
@@ -105,42 +246,199 @@ class Configuration(object):
 
     def has_key(self, key):
         ''' Emulate read-only container behaviour. '''
-        return key in self.config
+        return key in self._snapshot
+
+    def keys(self):
+        return self._snapshot.keys()
+
+    @property
+    def snapshot(self):
+        ''' The current ConfigSnapshot, for consistent reads of
+        multiple keys.
+        '''
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    # the ConfigStats collecting lookup statistics of all instances,
+    # set by Configurations.instrument
+    stats = None
+
+    # attribute names of the value sources in ascending order of
+    # precedence
+    layer_names = ('config_defaults', 'config_from_file', 'config_from_env',
+                   'config_from_cli', 'overridden')
+
+    @property
+    def layers(self):
+        ''' The value sources in ascending order of precedence. '''
+        return tuple(getattr(self, name) for name in self.layer_names)
+
+    @property
+    def config(self):
+        ''' A ConfigDict of all merged options.
+        This is assembled on each access, so single values should be
+        obtained by item access.
+        '''
+        snapshot = self._snapshot
+        config = ConfigDict()
+        for key in snapshot.keys():
+            dict.__setitem__(config, key, snapshot.option(key))
+        return config
 
     @property
     def info(self):
         ''' Return the contents of all sources. '''
-        s = 'Defaults: %s\nCLI: %s\nFiles: %s' % (str(self.config_defaults),
-                                                  str(self.config_from_cli),
-                                                  str(self.config_from_file))
+        s = 'Defaults: %s\nCLI: %s\nEnv: %s\nFiles: %s' % (
+            str(self.config_defaults), str(self.config_from_cli),
+            str(self.config_from_env), str(self.config_from_file))
         return s
 
-    def __rebuild_config(self):
-        ''' Collect the config options from the defaults, the file
-        config sections that have been default-added and the cli
-        config in that order and store them in self.config.
-        The defaults and file config sections are iterated in the
-        order of the additions of the defaults.
-        To be called after new values are added.
+    def _option(self, key, snapshot):
+        ''' Return the merged option for key in snapshot.
+        A cached option is valid for a snapshot if the key hasn't been
+        modified after the versions of both the snapshot and the cache
+        entry. Only options resolved from the current snapshot are
+        cached.
+        '''
+        entry = self._resolved.get(key)
+        modified = self._modified.get(key, 0)
+        if (entry is not None and modified <= entry[1] and
+                modified <= snapshot.version):
+            return entry[0]
+        if self.stats is None:
+            option = snapshot.resolve(key)
+        else:
+            option = self.stats.resolve(self, snapshot, key)
+        if snapshot is self._snapshot:
+            self._resolved[key] = option, snapshot.version
+        return option
+
+    def _resolve_keys(self, snapshot, keys):
+        ''' Return the merged options for those of keys that exist in
+        snapshot by key, raising the ConfigValueError of values that
+        can't be converted.
         '''
-        self.config = ConfigDict()
-        self.config.update(self.config_defaults)
-        self.config.update(self.config_from_file)
-        self.config.update(self.config_from_cli)
-        self.config.update(self.overridden)
+        if self.stats is None:
+            resolve = snapshot.resolve
+        else:
+            resolve = functools.partial(self.stats.resolve, self, snapshot)
+        return dict((key, resolve(key)) for key in keys if key in snapshot)
+
+    def _publish(self, keys):
+        ''' Make the current layers visible to readers as a new
+        snapshot, resolving the options for keys eagerly, so that
+        invalid values are rejected before anything is published.
+        '''
+        if not keys:
+            return
+        version = self._snapshot.version + 1
+        snapshot = ConfigSnapshot(self, version, self.layers)
+        options = self._resolve_keys(snapshot, keys)
+        for key in keys:
+            self._modified[key] = version
+            self._resolved.pop(key, None)
+        for key, option in options.items():
+            self._resolved[key] = option, version
+        self._snapshot = snapshot
+
+    def _update_layer(self, name, values, replace=False):
+        ''' Merge values into a copy of the layer called name, or into
+        an empty one if replace is True, and return it.
+        TypedConfigOptions that receive a new value are copied first, so
+        published layers stay unmodified. Within a batch, the layer and
+        each option are copied only once.
+        '''
+        batch = self._batch
+        if batch is None or name not in batch['layers']:
+            layer = (ConfigDict() if replace else
+                     ConfigDict(getattr(self, name)))
+            copied = set()
+            if batch is not None:
+                batch['layers'][name] = copied
+            setattr(self, name, layer)
+        else:
+            layer = getattr(self, name)
+            copied = batch['layers'][name]
+            if replace:
+                layer.clear()
+        for key in values:
+            value = dict.get(layer, key)
+            if key not in copied and isinstance(value, TypedConfigOption):
+                dict.__setitem__(layer, key, copy.copy(value))
+        layer.update(values)
+        copied.update(values)
+        return layer
 
     def config_update(f):
+        ''' Decorated methods replace the layers they modify and return
+        the keys they have changed, which are then published, or
+        recorded if a batch is running.
+        If a value can't be converted, the error is raised and the
+        layers are restored. Within a batch, the batch is rolled back
+        instead if the error propagates out of it.
+        '''
         def wrap(self, *a, **kw):
-            f(self, *a, **kw)
-            self.__rebuild_config()
+            with self._lock:
+                stats = self.stats
+                start = None if stats is None else time.perf_counter()
+                saved = self.layers
+                try:
+                    keys = f(self, *a, **kw)
+                    if self._batch is None:
+                        self._publish(keys)
+                    else:
+                        snapshot = ConfigSnapshot(self, self.version,
+                                                  self.layers)
+                        self._resolve_keys(snapshot, keys)
+                        self._batch['keys'].update(keys)
+                except BaseException:
+                    if self._batch is None:
+                        for name, layer in zip(self.layer_names, saved):
+                            setattr(self, name, layer)
+                    raise
+                if start is not None:
+                    stats.record_update(self, time.perf_counter() - start)
+                return keys
         return wrap
 
+    @contextmanager
+    def batch(self):
+        ''' Collect all modifications made in the block and publish them
+        as a single new version at its end. Readers see the previous
+        version until then. If an exception is raised, including for a
+        value that can't be converted, the layers are restored and
+        nothing is published.
+        Other writers are blocked for the duration; nested batches are
+        merged into the outermost one.
+        '''
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+            saved = dict((name, getattr(self, name))
+                         for name in self.layer_names)
+            self._batch = dict(keys=set(), layers=dict())
+            try:
+                yield self
+                self._publish(self._batch['keys'])
+            except BaseException:
+                for name, layer in saved.items():
+                    setattr(self, name, layer)
+                raise
+            finally:
+                self._batch = None
+
     @config_update
     def set_defaults(self, new_defaults):
         ''' Add a new unique section with default values to the list of
         default options.
         '''
-        self.config_defaults.update(new_defaults)
+        new_defaults = dict(new_defaults)
+        self._update_layer('config_defaults', new_defaults)
+        return new_defaults.keys()
 
     @config_update
     def set_cli_config(self, values):
@@ -151,22 +449,96 @@ class Configuration(object):
             thus not considered here.
             @type values: optparse.Values
         '''
-        self.config_from_cli.update([key, value] for key, value in
-                                    values.__dict__.items()
-                                    if value is not None and
-                                    key in self.config_defaults)
+        new = dict((key, value) for key, value in values.__dict__.items()
+                   if value is not None and key in self.config_defaults)
+        self._update_layer('config_from_cli', new)
+        return new.keys()
+
+    @config_update
+    def set_env_config(self, values):
+        ''' Replace the values read from environment variables.
+        Like file values, they are converted by the TypedConfigOptions
+        of the lower layers when merged.
+        '''
+        old = set(self.config_from_env)
+        layer = self._update_layer('config_from_env', values, replace=True)
+        return old | set(layer)
 
     @config_update
     def set_file_config(self, file_config):
-        ''' Add the values obtained from the files as a ConfigDict
-        object and rebuild the main config.
+        ''' Replace the values obtained from the files with a new
+        ConfigDict object.
         '''
-        self.config_from_file = ConfigDict()
-        self.config_from_file.update(file_config)
+        old = set(self.config_from_file)
+        layer = self._update_layer('config_from_file', file_config,
+                                   replace=True)
+        return old | set(layer)
+
+    @config_update
+    def reload_file_config(self, file_config, keys):
+        ''' Update the file values for keys, which have changed on disk.
+        Keys that are missing in file_config are removed.
+        '''
+        layer = self._update_layer('config_from_file',
+                                   dict((k, file_config[k]) for k in keys
+                                        if k in file_config))
+        for key in keys:
+            if key not in file_config:
+                layer.pop(key, None)
+        return keys
+
+    @config_update
+    def restore_layers(self, layers):
+        ''' Replace the layers with those of a previous snapshot.
+        Only keys whose values differ are invalidated and returned.
+        '''
+        changed = set()
+        for name, layer in zip(self.layer_names, layers):
+            current = getattr(self, name)
+            if current is not layer:
+                changed.update(key for key in set(current) | set(layer)
+                               if dict.get(current, key) is not
+                               dict.get(layer, key))
+                setattr(self, name, layer)
+        return changed
 
     @config_update
     def override(self, **values):
-        self.overridden.update(values)
+        self._update_layer('overridden', values)
+        return values.keys()
+
+    @contextmanager
+    def scoped(self, **values):
+        ''' Override values for the current thread or asyncio task only,
+        until the end of the block. They take precedence over all layers
+        and nested blocks take precedence over outer ones.
+        The values are not part of any snapshot, so entering and leaving
+        the block neither publishes a version nor invalidates cached
+        options; item access and configurable properties see them, but
+        snapshot and config don't.
+        '''
+        scopes = dict(_scoped_overrides.get() or {})
+        current = dict(scopes.get(self, {}))
+        for key, value in values.items():
+            current[key] = self._scoped_value(key, value)
+        scopes[self] = current
+        token = _scoped_overrides.set(scopes)
+        try:
+            yield self
+        finally:
+            _scoped_overrides.reset(token)
+
+    def _scoped_value(self, key, value):
+        ''' Convert value like override would, by merging it into a copy
+        of the current option for key.
+        '''
+        layer = ConfigDict()
+        if key in self._snapshot:
+            option = self._snapshot.option(key)
+            if isinstance(option, TypedConfigOption):
+                dict.__setitem__(layer, key, copy.copy(option))
+        layer[key] = value
+        return layer.getitem(key)
 
     def config_from_section(self, section, key):
         ''' Obtain the value that key has in the specific section,
@@ -233,24 +605,80 @@ class ConfigurationFactory(object):
         self.files = []
         self.config_parser = configparser.ConfigParser()
         self._allow_files = allow_files
+        # stat signatures of the files at the time they were read
+        self._stats = dict()
+        # names of the sections created from this factory
+        self.sections = set()
 
     def add_files(self, files):
-        self.files += files
-        self.read_config()
+        ''' Read the given files into the parser in order, skipping
+        those that have already been read and didn't change since.
+        '''
+        for path in files:
+            if path not in self.files:
+                self.files.append(path)
+            self._read_file(path)
 
     def read_config(self):
-        self.config_parser.read(self.files)
+        ''' Read all files again, starting with an empty parser. '''
+        self.config_parser = configparser.ConfigParser()
+        self._stats = dict()
+        for path in self.files:
+            self._read_file(path)
+
+    def _read_file(self, path):
+        stat, sections = parse_config_file(path)
+        if stat is not None and self._stats.get(path) != stat:
+            for name, values in sections.items():
+                try:
+                    self.config_parser.read_dict({name: values}, path)
+                except (ValueError, configparser.Error) as e:
+                    logger.error('configparser: ' + str(e))
+            self._stats[path] = stat
+
+    @property
+    def changed_files(self):
+        ''' The files that were modified, created or deleted since they
+        were last read.
+        '''
+        return [path for path in self.files
+                if file_stat(path) != self._stats.get(path)]
+
+    def section_values(self, section):
+        try:
+            return dict(self.config_parser.items(section))
+        except configparser.NoSectionError as e:
+            logger.debug('configparser: ' + str(e))
+        except configparser.Error as e:
+            logger.error('configparser: ' + str(e))
+        return dict()
+
+    def reload(self):
+        ''' Read the files again if any of them changed.
+        Return a dict mapping the names of the sections created by this
+        factory that have changed to a tuple of their new values and
+        the names of the changed keys.
+        '''
+        if not (self._allow_files and self.changed_files):
+            return dict()
+        old = dict((s, self.section_values(s)) for s in self.sections)
+        self.read_config()
+        changed = dict()
+        for section in self.sections:
+            values = self.section_values(section)
+            keys = set(key for key in set(old[section]) | set(values)
+                       if old[section].get(key) != values.get(key))
+            if keys:
+                changed[section] = values, keys
+        return changed
 
     def create(self, section, defaults):
         config = Configuration(defaults)
+        self.sections.add(section)
         if self._allow_files:
-            try:
-                file_config = dict(self.config_parser.items(section))
+            file_config = self.section_values(section)
+            if file_config:
                 config.set_file_config(file_config)
-            except configparser.NoSectionError as e:
-                logger.debug('configparser: ' + str(e))
-            except configparser.Error as e:
-                logger.error('configparser: ' + str(e))
         return config
 
 
@@ -266,7 +694,10 @@ class ConfigProxy(object):
         return self[key]
 
     def __getitem__(self, key):
-        return self._config[key]
+        accessor = self._config._accessors.get(key)
+        if accessor is None:
+            return self._config[key]
+        return accessor()
 
 
 class ConfigMeta(type):
@@ -275,9 +706,13 @@ class ConfigMeta(type):
         return str(self._configs)
 
     def __getitem__(self, section):
-        if section not in self._configs:
+        config = self._configs.get(section)
+        if config is None:
             raise NoSuchSectionError(section)
-        return ConfigProxy(self._configs[section])
+        proxy = self._proxies.get(section)
+        if proxy is None or proxy._config is not config:
+            proxy = self._proxies[section] = ConfigProxy(config)
+        return proxy
 
 
 class Configurations(object, metaclass=ConfigMeta):
@@ -289,18 +724,43 @@ class Configurations(object, metaclass=ConfigMeta):
     _factories = {}
     # A dict of Configuration instances by their section name
     _configs = {}
+    # ConfigProxy instances by section name, reused while the section's
+    # Configuration is the same
+    _proxies = {}
     _cli_config = None
+    # the environment snapshot taken by set_env_config with the variable
+    # prefix and the prefixes by section
+    _env_config = None
     # A mapping of config keys to -x cli short option characters
     _cli_short_options = {}
     _cli_params = {}
-    # A dict of lists of client instances grouped by the name of the
-    # target Configuration's name
+    # ArgumentParsers built by parse_cli, by the names of the positionals
+    # and options they define
+    _cli_parsers = {}
+    # WeakSets of client instances that wait for their Configuration, by
+    # its section name
     _pending_clients = {}
     # classes that have attributes set from configurable decorator
     _configurables = set()
+    # instances that have cached config values in configurable
+    # properties, in WeakSets by (section, key)
+    _readers = {}
+    # thread reloading the config files on changes, see watch()
+    _watcher = None
+    # thread reloading the config files on request, see reload_on_signal()
+    _reloader = None
+    # number of threads used to import config modules and to run their
+    # reset_config functions in setup(), sequential if unset
+    setup_workers = None
+    # guards registration, which may happen from concurrent
+    # reset_config functions
+    _lock = threading.RLock()
     # read config from file system
     allow_files = True
     allow_override = True
+    # if set, the state created by setup() is stored in this file and
+    # reused by later setups, as long as no config module or file changed
+    cache_file = None
     default_metadata = dict(parents=[], std_files=True, files=[])
     metadata = {}
 
@@ -311,9 +771,10 @@ class Configurations(object, metaclass=ConfigMeta):
 
     @classmethod
     def register_files(cls, alias, *files):
-        cls.create_alias(alias)
         files = [os.path.abspath(os.path.expanduser(f)) for f in files]
-        cls._factories[alias].add_files(files)
+        with cls._lock:
+            cls.create_alias(alias)
+            cls._factories[alias].add_files(files)
 
     @classmethod
     def register_config(cls, file_alias, section, **defaults):
@@ -323,38 +784,93 @@ class Configurations(object, metaclass=ConfigMeta):
         If register_files wasn't called with this alias before, it is
         created now.
         '''
-        cls.create_alias(file_alias)
-        if section not in cls._configs:
-            config = cls._factories[file_alias].create(section, defaults)
-            if cls._cli_config:
-                config.set_cli_config(cls._cli_config)
-            cls._configs[section] = config
-            cls.notify_clients(section)
-        else:
-            cls._configs[section].set_defaults(defaults)
+        with cls._lock:
+            cls.create_alias(file_alias)
+            if section not in cls._configs:
+                config = cls._factories[file_alias].create(section,
+                                                           defaults)
+                if cls._env_config:
+                    config.set_env_config(cls._env_values(section, config))
+                if cls._cli_config:
+                    config.set_cli_config(cls._cli_config)
+                cls._configs[section] = config
+                created = _created_sections.get()
+                if created is not None:
+                    created.append(section)
+                cls.notify_clients(section)
+            else:
+                cls._configs[section].set_defaults(defaults)
 
     @classmethod
     def set_cli_config(cls, values):
-        cls._cli_config = values
-        for config in list(cls._configs.values()):
-            config.set_cli_config(values)
+        ''' Set the command line values of all sections, including those
+        registered later. If a value can't be converted, all sections
+        are rolled back.
+        '''
+        with cls.batch():
+            cls._cli_config = values
+            for config in list(cls._configs.values()):
+                config.set_cli_config(values)
         cls.notify_all_clients()
 
+    @classmethod
+    def set_env_config(cls, prefix='', sections=None, environ=None):
+        ''' Take a single snapshot of os.environ, or of environ if
+        given, and set the environment values of all sections from it,
+        including those registered later.
+        The variable for a key is named <prefix><section>_<key> in upper
+        case, with characters other than letters, digits and underscores
+        replaced by underscores. sections can map section names to other
+        variable prefixes than <prefix><section>_.
+        Each section publishes its values in a single update. If a value
+        can't be converted, all sections are rolled back.
+        '''
+        environ = dict(os.environ if environ is None else environ)
+        with cls.batch():
+            cls._env_config = environ, prefix, dict(sections or {})
+            for section, config in list(cls._configs.items()):
+                config.set_env_config(cls._env_values(section, config))
+        cls.notify_all_clients()
+
+    @classmethod
+    def _env_values(cls, section, config):
+        ''' Return the values in the environment snapshot for the keys
+        defined in the defaults of config.
+        '''
+        environ, prefix, sections = cls._env_config
+        var_prefix = sections.get(section)
+        if var_prefix is None:
+            var_prefix = _env_name('{}{}_'.format(prefix, section))
+        values = dict()
+        for key in config.config_defaults:
+            name = var_prefix + _env_name(key)
+            if name in environ:
+                values[key] = environ[name]
+        return values
+
     @classmethod
     def register_client(cls, client):
         ''' Connect a client instance to the according Configuration
         instance, buffering the request if neccessary.
+        Pending clients are referenced weakly, so those that are
+        collected before their Configuration is added are dropped.
         '''
         try:
             client.connect(cls._configs[client.name])
         except KeyError:
-            if client.name not in cls._pending_clients:
-                cls._pending_clients[client.name] = []
-            cls._pending_clients[client.name].append(client)
+            clients = cls._pending_clients.get(client.name)
+            if clients is None:
+                clients = cls._pending_clients[client.name] = weakref.WeakSet()
+            clients.add(client)
 
     @classmethod
     def notify_all_clients(cls):
-        for name in list(cls._pending_clients.keys()):
+        ''' Connect the pending clients of all added Configurations.
+        Only names that are both pending and added are visited.
+        '''
+        pending, configs = cls._pending_clients, cls._configs
+        names = pending if len(pending) < len(configs) else configs
+        for name in [n for n in names if n in pending and n in configs]:
             cls.notify_clients(name)
 
     @classmethod
@@ -364,10 +880,11 @@ class Configurations(object, metaclass=ConfigMeta):
 
         '''
         if name in cls._configs:
-            if name in cls._pending_clients:
-                for client in cls._pending_clients[name]:
-                    client.connect(cls._configs[name])
-                del cls._pending_clients[name]
+            clients = cls._pending_clients.pop(name, None)
+            if clients is not None:
+                config = cls._configs[name]
+                for client in list(clients):
+                    client.connect(config)
         else:
             logger.debug('Configurations.notify clients called for'
                          ' Configuration \'%s\' which hasn\'t been added yet' %
@@ -382,6 +899,31 @@ class Configurations(object, metaclass=ConfigMeta):
                 msg = 'Tried to override defaults in nonexistent section "{}"'
                 logger.debug(msg.format(section))
 
+    @classmethod
+    @contextmanager
+    def batch(self):
+        ''' Run Configuration.batch for all sections, so that each
+        section publishes the modifications made in the block at most
+        once. On exception, the sections are rolled back.
+        '''
+        cli_config, env_config = self._cli_config, self._env_config
+        with ExitStack() as stack:
+            for config in list(self._configs.values()):
+                stack.enter_context(config.batch())
+            try:
+                yield self
+            except BaseException:
+                self._cli_config = cli_config
+                self._env_config = env_config
+                raise
+
+    @classmethod
+    def snapshot(self, section):
+        ''' Return the current ConfigSnapshot of section. '''
+        if section not in self._configs:
+            raise NoSuchSectionError(section)
+        return self._configs[section].snapshot
+
     @classmethod
     def override(self, section, **values):
         if self.allow_override:
@@ -392,93 +934,175 @@ class Configurations(object, metaclass=ConfigMeta):
                              ' %s' % section)
 
     @classmethod
-    def parse_cli(self, positional=()):
+    @contextmanager
+    def scoped_override(self, section, **values):
+        ''' Override values in section for the current thread or asyncio
+        task only, until the end of the block.
+        See Configuration.scoped.
+        '''
+        if self.allow_override and section in self._configs:
+            with self._configs[section].scoped(**values):
+                yield
+        else:
+            if self.allow_override:
+                logger.debug('Tried to override values in nonexistent'
+                             ' section %s' % section)
+            yield
+
+    @classmethod
+    def parse_cli(self, positional=(), args=None, subcommands=False):
         ''' Add positional parameters, then define options and switches
         based on the config. Parse command line parameters and set
         optional positionals to None that haven't been specified at cli.
         Write parsed options to config.
+        The ArgumentParser is built once for each combination of
+        positionals and option names and reused by later calls.
+        If subcommands is True, the first parameter selects a section and
+        only a parser for the options of that section is built. The
+        name of the section is returned.
         '''
-        from argparse import ArgumentParser
-        parser = ArgumentParser()
-        seen = []
-
-        def positional_not_as_tuple():
-            ''' backwards compatibility for parameter positional.
-            Previously, only one positional argument was possible.
-            '''
-            return (isinstance(positional, (tuple, list)) and positional and
-                    not isinstance(positional[0], (tuple, list)))
-        if positional_not_as_tuple():
-            positional = (positional,)
-        for pos_arg in positional:
-            parser.add_argument(pos_arg[0], nargs=pos_arg[1])
-
-        def is_not_positional(name, value):
-            ''' Check if either the config defines this value as
-            positional or the caller requested the parameter of that
-            name as positional
-            '''
-            return (not (isinstance(value, ConfigOption) and value.positional)
-                    and (positional is None or not find(lambda p: p[0] == name,
-                                                        positional)))
-
-        def add_option(name, value):
-            arg = ['']
-            params = {}
-
-            def add():
-                parser.add_argument(*arg, **params)
-            switchname = name.replace('_', '-')
-            arg = ['--%s' % switchname]
-            params = {'default': None}
-            if name in self._cli_short_options:
-                arg.append('-%s' % self._cli_short_options[name])
-            if name in self._cli_params:
-                params.update(self._cli_params[name])
-            if isinstance(value, ConfigOption):
-                params.update(value.argparse_params)
-                if value.short:
-                    arg.append('-%s' % value.short)
-            if isinstance(value, BoolConfigOption):
-                params['action'] = 'store_true'
-                if value.no:
-                    add()
-                    params = {'default': None}
-                    arg = ['--no-%s' % switchname]
-                    if value.no_switch is not None:
-                        arg.append(value.no_switch)
-                    params['action'] = 'store_false'
-                    params['dest'] = name
-            add()
-        for config in self._configs.values():
-            for name, value in config.config.items():
-                if name in seen:
-                    continue
-                seen.append(name)
-                if is_not_positional(name, value):
-                    add_option(name, value)
-        args = parser.parse_args()
+        positional = self._cli_positionals(positional)
+        section = None
+        if subcommands:
+            section, args = self._parse_subcommand(args)
+            parser = self._cli_parser(positional, [section],
+                                      prog=self._cli_prog(section))
+        else:
+            parser = self._cli_parser(positional, list(self._configs))
+        args = parser.parse_args(args)
         for pos_arg in positional:
             if pos_arg is not None and not getattr(args, pos_arg[0]):
                 setattr(args, pos_arg[0], None)
         self.set_cli_config(args)
+        return section
+
+    @classmethod
+    def _cli_positionals(self, positional):
+        ''' Normalize positional to a hashable tuple of (name, nargs).
+        For backwards compatibility, a single positional argument can be
+        passed as a plain pair.
+        '''
+        if positional is None:
+            return ()
+        if (isinstance(positional, (tuple, list)) and positional and
+                not isinstance(positional[0], (tuple, list))):
+            positional = (positional,)
+        return tuple(tuple(pos_arg) for pos_arg in positional)
+
+    @classmethod
+    def _cli_prog(self, section):
+        return '{} {}'.format(os.path.basename(sys.argv[0]), section)
+
+    @classmethod
+    def _parse_subcommand(self, args):
+        ''' Split the section name off args. '''
+        from argparse import ArgumentParser, REMAINDER
+        parser = ArgumentParser()
+        parser.add_argument('section', choices=sorted(self._configs))
+        parser.add_argument('args', nargs=REMAINDER)
+        parsed = parser.parse_args(args)
+        return parsed.section, parsed.args
+
+    @classmethod
+    def _cli_parser(self, positional, sections, prog=None):
+        ''' Return the ArgumentParser for the positionals and the
+        options of sections, cached by their names and the class and
+        OptionMeta of each option, which determine its switches.
+        '''
+        snapshots = [(name, self._configs[name].snapshot)
+                     for name in sections]
+        key = (prog, positional,
+               tuple((name, tuple(self._cli_option_key(snapshot, option)
+                                  for option in snapshot.keys()))
+                     for name, snapshot in snapshots))
+        try:
+            parser = self._cli_parsers.get(key)
+        except TypeError:
+            return self._build_cli_parser(positional, snapshots, prog)
+        if parser is None:
+            parser = self._build_cli_parser(positional, snapshots, prog)
+            self._cli_parsers[key] = parser
+        return parser
+
+    @classmethod
+    def _cli_option_key(self, snapshot, name):
+        value = snapshot.option(name)
+        return name, type(value), getattr(value, '_meta', None)
+
+    @classmethod
+    def _build_cli_parser(self, positional, snapshots, prog):
+        ''' Define the positionals, then an option for each name in the
+        snapshots that is neither positional in its config nor among the
+        positionals. Names occurring in multiple sections are added
+        once.
+        '''
+        from argparse import ArgumentParser
+        parser = ArgumentParser(prog=prog)
+        for name, nargs in positional:
+            parser.add_argument(name, nargs=nargs)
+        seen = set(name for name, nargs in positional)
+        for section, snapshot in snapshots:
+            for name in snapshot.keys():
+                if name in seen:
+                    continue
+                seen.add(name)
+                value = snapshot.option(name)
+                if not (isinstance(value, ConfigOption) and value.positional):
+                    self._add_cli_option(parser, name, value)
+        return parser
+
+    @classmethod
+    def _add_cli_option(self, parser, name, value):
+        arg = ['']
+        params = {}
+
+        def add():
+            parser.add_argument(*arg, **params)
+        switchname = name.replace('_', '-')
+        arg = ['--%s' % switchname]
+        params = {'default': None}
+        if name in self._cli_short_options:
+            arg.append('-%s' % self._cli_short_options[name])
+        if name in self._cli_params:
+            params.update(self._cli_params[name])
+        if isinstance(value, ConfigOption):
+            params.update(value.argparse_params)
+            if value.short:
+                arg.append('-%s' % value.short)
+        if isinstance(value, BoolConfigOption):
+            params['action'] = 'store_true'
+            if value.no:
+                add()
+                params = {'default': None}
+                arg = ['--no-%s' % switchname]
+                if value.no_switch is not None:
+                    arg.append(value.no_switch)
+                params['action'] = 'store_false'
+                params['dest'] = name
+        add()
 
     @classmethod
     def set_cli_short_options(self, **options):
         self._cli_short_options.update(options)
+        self._cli_parsers = {}
 
     @classmethod
     def set_cli_params(self, name, *short, **params):
         if short:
-            self.set_cli_short_options(dict([[name, short[0]]]))
+            self.set_cli_short_options(**{name: short[0]})
         self._cli_params[name] = params
+        self._cli_parsers = {}
 
     @classmethod
     def clear(self):
         self._configs = {}
+        self._proxies = {}
         self._cli_config = None
+        self._env_config = None
         self._pending_clients = {}
         self._factories = {}
+        self._readers = {}
+        self._cli_parsers = {}
         for cls in self._configurables:
             if hasattr(cls, '__conf_init__'):
                 cls.__init__ = cls.__conf_init__
@@ -487,6 +1111,37 @@ class Configurations(object, metaclass=ConfigMeta):
     def clear_configs(self):
         self.clear()
 
+    @classmethod
+    def save_state(self):
+        ''' Return a ConfigState that can restore the current state with
+        restore_state().
+        '''
+        from tek.config.state import ConfigState
+        return ConfigState(self)
+
+    @classmethod
+    def restore_state(self, state):
+        state.restore(self)
+
+    @classmethod
+    def export_state(self):
+        ''' Return the resolved configuration as bytes, including the
+        cli and override layers, to be installed in worker processes
+        with import_state() instead of running setup() and parse_cli()
+        there.
+        '''
+        from tek.config.state import export_state
+        return export_state(self)
+
+    @classmethod
+    def import_state(self, data):
+        ''' Install a state created by export_state(), without
+        importing config modules or reading files.
+        Can be used as a process pool initializer.
+        '''
+        from tek.config.state import import_state
+        import_state(self, data)
+
     @classmethod
     def clear_metadata(self):
         self.metadata = {}
@@ -495,6 +1150,136 @@ class Configurations(object, metaclass=ConfigMeta):
     def add_configurable(self, cls):
         self._configurables.add(cls)
 
+    @classmethod
+    def register_reader(self, section, key, instance):
+        ''' Remember that instance has cached the value of key in a
+        configurable property, so it can be reset when the value
+        changes.
+        '''
+        try:
+            readers = self._readers.setdefault((section, key),
+                                               weakref.WeakSet())
+            readers.add(instance)
+        except TypeError:
+            pass
+
+    @classmethod
+    def reset_readers(self, section, keys):
+        ''' Delete the cached values of the configurable properties for
+        keys in section from all live instances, so the next access
+        obtains the current value.
+        '''
+        for key in keys:
+            names = ['_{}'.format(key), '_{}__{}'.format(section, key)]
+            for instance in list(self._readers.pop((section, key), [])):
+                for name in names:
+                    instance.__dict__.pop(name, None)
+
+    @classmethod
+    def reload(self):
+        ''' Read the config files that changed since they were last read
+        and update the file values of the affected sections.
+        Return a dict of the changed keys by section.
+        '''
+        changed = dict()
+        for factory in list(self._factories.values()):
+            for section, (values, keys) in factory.reload().items():
+                if section in self._configs:
+                    self._configs[section].reload_file_config(values, keys)
+                    self.reset_readers(section, keys)
+                    changed[section] = keys
+        if changed:
+            logger.debug('reloaded config: {}'.format(changed))
+        return changed
+
+    @classmethod
+    def watch(self, interval=1.):
+        ''' Start a thread that calls reload() when config files
+        change.
+        '''
+        from tek.config.watch import ConfigWatcher
+        if self._watcher is None:
+            self._watcher = ConfigWatcher(self, interval)
+            self._watcher.start()
+
+    @classmethod
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    @classmethod
+    def reload_on_signal(self, signum=None):
+        ''' Install a handler for signum, SIGHUP by default, in
+        SignalManager that makes a ConfigReloader thread call reload(),
+        so the reload doesn't run inside a write interrupted by the
+        signal.
+        '''
+        import signal
+        from tek.run import SignalManager
+        from tek.config.watch import ConfigReloader
+        if signum is None:
+            signum = signal.SIGHUP
+        with self._lock:
+            if self._reloader is None:
+                self._reloader = ConfigReloader(self)
+                self._reloader.start()
+            reloader = self._reloader
+        handler = lambda s, f: reloader.request()
+        SignalManager.instance.add(signum, handler, persistent=True)
+        return handler
+
+    @classmethod
+    def instrument(self, sample_rate=100):
+        ''' Start counting the reads of each key in all sections, timing
+        every sample_rate-th read of a key and all updates and option
+        resolutions. Previous statistics are discarded.
+        Reads through configurable properties are only counted until the
+        value is cached.
+        Return the ConfigStats.
+        '''
+        from tek.config.stats import ConfigStats
+        Configuration.stats = ConfigStats(sample_rate)
+        self._reset_accessors()
+        return Configuration.stats
+
+    @classmethod
+    def stop_instrumenting(self):
+        Configuration.stats = None
+        self._reset_accessors()
+
+    @classmethod
+    def _reset_accessors(self):
+        for config in list(self._configs.values()):
+            config._accessors = dict()
+
+    @classmethod
+    def stats_report(self):
+        ''' Return the report of the statistics collected since
+        instrument() for the current sections, or None if not
+        instrumenting. See ConfigStats.report.
+        '''
+        stats = Configuration.stats
+        return None if stats is None else stats.report(self._configs)
+
+    @classmethod
+    def dump_stats_on_signal(self, signum=None):
+        ''' Install a handler for signum, SIGUSR1 by default, in
+        SignalManager that logs the stats report.
+        '''
+        import signal
+        from tek.run import SignalManager
+        from tek.config.stats import format_report
+        if signum is None:
+            signum = signal.SIGUSR1
+
+        def handler(s, f):
+            report = self.stats_report()
+            if report is not None:
+                logger.info(format_report(report))
+        SignalManager.instance.add(signum, handler, persistent=True)
+        return handler
+
     @classmethod
     def write_config(self, filename):
         def write_section(f, section, config):
@@ -520,22 +1305,36 @@ class Configurations(object, metaclass=ConfigMeta):
             self._load_config(name)
 
     @classmethod
-    def _load_config(self, name):
+    def _import_config(self, name):
         try:
-            module = importlib.import_module('{}.config'.format(name))
+            return importlib.import_module('{}.config'.format(name))
         except ImportError as e:
             text = 'Could not import config {}!'
             raise ConfigLoadError(text.format(name)) from e
-        metadata = copy.deepcopy(self.default_metadata)
-        metadata.update(getattr(module, 'metadata', {}))
+
+    @classmethod
+    def _add_metadata(self, name, module):
         func = getattr(module, 'reset_config', None)
         if func is None:
             text = 'Missing reset_config function for {}!'
             raise ConfigLoadError(text.format(name))
+        self.add_metadata(name, getattr(module, 'metadata', {}), func)
+
+    @classmethod
+    def add_metadata(self, name, values, func):
+        ''' Register the config name with the given metadata values and
+        reset_config function, without loading its dependencies.
+        '''
+        metadata = copy.deepcopy(self.default_metadata)
+        metadata.update(values)
         self.metadata[name] = metadata
         self.metadata[name]['func'] = func
         self.metadata[name]['name'] = name
         metadata.setdefault('alias', name.split('.')[0])
+
+    @classmethod
+    def _load_config(self, name):
+        self._add_metadata(name, self._import_config(name))
         self.load_dependencies(name)
 
     @classmethod
@@ -543,21 +1342,92 @@ class Configurations(object, metaclass=ConfigMeta):
         for dep in self.metadata[name]['parents']:
             self.load_config(dep)
 
+    @classmethod
+    def load_configs(self, names):
+        ''' Load the configs for names and their dependencies.
+        If setup_workers is set, the modules are imported concurrently,
+        one generation of dependencies at a time.
+        '''
+        if not self.setup_workers:
+            for name in names:
+                self.load_config(name)
+            return
+        pending = [n for n in dict.fromkeys(names) if n not in self.metadata]
+        with ThreadPoolExecutor(self.setup_workers) as executor:
+            while pending:
+                modules = list(executor.map(self._import_config, pending))
+                for name, module in zip(pending, modules):
+                    self._add_metadata(name, module)
+                parents = (p for n in pending
+                           for p in self.metadata[n]['parents'])
+                pending = [p for p in dict.fromkeys(parents)
+                           if p not in self.metadata]
+
     @classmethod
     def setup(self, *names, files=True):
+        from tek.config import cache
+        if self.cache_file and cache.load(self, self.cache_file, names,
+                                          files):
+            return
         self.clear_metadata()
-        for name in names:
-            self.load_config(name)
+        self.load_configs(names)
         self.reset(files)
+        if self.cache_file:
+            cache.store(self, self.cache_file, names, files)
 
     @classmethod
     def reset(self, files=True, alias=None):
+        ''' Recreate all sections by calling the reset_config
+        functions of the loaded configs in dependency order.
+        If setup_workers is set, the functions of configs that don't
+        depend on each other run concurrently. The sections they return
+        are registered afterwards, and all sections created by a level
+        are then ordered like in a serial run, so the order is
+        deterministic.
+        '''
         self.clear_configs()
-        for metadata in self.order_dependencies(alias):
-            self.auto_setup_alias(metadata, files)
-            config = metadata['func']()
-            if config:
-                self.auto_setup_configs(metadata, config)
+        if not self.setup_workers:
+            for metadata in self.order_dependencies(alias):
+                self.auto_setup_alias(metadata, files)
+                config = metadata['func']()
+                if config:
+                    self.auto_setup_configs(metadata, config)
+            return
+        with ThreadPoolExecutor(self.setup_workers) as executor:
+            for level in self.dependency_levels(alias):
+                for metadata in level:
+                    self.auto_setup_alias(metadata, files)
+                results = list(executor.map(self._reset_config, level))
+                for metadata, (config, created) in zip(level, results):
+                    if config:
+                        token = _created_sections.set(created)
+                        try:
+                            self.auto_setup_configs(metadata, config)
+                        finally:
+                            _created_sections.reset(token)
+                self._order_sections([section for config, created in results
+                                      for section in created])
+
+    @classmethod
+    def _reset_config(self, metadata):
+        ''' Call the reset_config function of metadata, returning its
+        result and the names of the sections it created.
+        '''
+        created = []
+        token = _created_sections.set(created)
+        try:
+            return metadata['func'](), created
+        finally:
+            _created_sections.reset(token)
+
+    @classmethod
+    def _order_sections(self, sections):
+        ''' Move sections to the end of the registered sections, in the
+        given order.
+        '''
+        with self._lock:
+            for section in sections:
+                self._configs[section] = self._configs.pop(section)
 
     @classmethod
     def auto_setup_alias(self, metadata, add_files):
@@ -574,41 +1444,118 @@ class Configurations(object, metaclass=ConfigMeta):
         for section, defaults in config.items():
             self.register_config(metadata['alias'], section, **defaults)
 
+    @classmethod
+    def dependency_levels(self, alias=None):
+        ''' Return the metadata of the loaded configs in lists, each
+        of which only depends on configs in the previous lists.
+        If alias is given, only configs with an alias in it are
+        considered.
+        '''
+        parents = dict((name, m['parents'])
+                       for name, m in self.metadata.items()
+                       if alias is None or m['alias'] in alias)
+        return [[self.metadata[name] for name in level]
+                for level in _dependency_levels(parents)]
+
     @classmethod
     def order_dependencies(self, alias=None):
-        pending = [name for name, m in self.metadata.items()
-                   if alias is None or m['alias'] in alias]
-
-        def resolved(key):
-            parents = self.metadata[key]['parents']
-            return not parents or not any(p in pending for p in parents)
-        while pending:
-            none_found = True
-            for name in pending:
-                if resolved(name):
-                    yield self.metadata[name]
-                    pending.remove(name)
-                    pending = [n for n in pending if n != name]
-                    none_found = False
-            if none_found:
-                text = 'Circular dependencies for keys: {}!'
-                raise ConfigLoadError(text.format(pending))
+        for level in self.dependency_levels(alias):
+            for metadata in level:
+                yield metadata
 
 Config = Configurations
 
+
+def _find_cycle(parents, remaining):
+    ''' Follow unresolved parents starting at the first remaining
+    name until a name repeats.
+    '''
+    unresolved = set(remaining)
+    path = [remaining[0]]
+    seen = {remaining[0]: 0}
+    while True:
+        name = next(p for p in parents[path[-1]] if p in unresolved)
+        if name in seen:
+            return path[seen[name]:] + [name]
+        seen[name] = len(path)
+        path.append(name)
+
+
+def _dependency_levels(parents):
+    ''' Kahn's algorithm over parents, a dict mapping names to their
+    parents. Parents that aren't keys of the dict are ignored.
+    Within a level, names keep the order of the dict.
+    '''
+    index = dict((name, i) for i, name in enumerate(parents))
+    children = dict((name, []) for name in parents)
+    indegree = dict()
+    for name, deps in parents.items():
+        deps = [p for p in dict.fromkeys(deps) if p in index]
+        indegree[name] = len(deps)
+        for parent in deps:
+            children[parent].append(name)
+    levels = []
+    level = [name for name in parents if not indegree[name]]
+    while level:
+        levels.append(level)
+        freed = []
+        for name in level:
+            for child in children[name]:
+                indegree[child] -= 1
+                if not indegree[child]:
+                    freed.append(child)
+        level = sorted(freed, key=index.get)
+    remaining = [name for name in parents if indegree[name]]
+    if remaining:
+        cycle = _find_cycle(parents, remaining)
+        text = 'Circular dependencies: {}!'
+        raise ConfigLoadError(text.format(' -> '.join(cycle)))
+    return levels
+
+
+env_name_re = re.compile(r'\W')
+
+
+def _env_name(name):
+    return env_name_re.sub('_', name).upper()
+
+
 conf_attr_re = re.compile(r'_((?P<section>.+)__)?(?P<key>.+)')
 
 
+class _config_property(lazy_property):
+    ''' Lazy property for a config value that yields to a scoped
+    override of the key while one is active, without caching it.
+    '''
+
+    def __init__(self, method, section, key, name=None):
+        super().__init__(method, name=name)
+        self.section = section
+        self.key = key
+
+    def __get__(self, instance, owner):
+        if instance is not None and _scoped_overrides.get() is not None:
+            values = _scoped_values(Configurations._configs.get(self.section))
+            if values is not None and self.key in values:
+                return values[self.key]
+        return super().__get__(instance, owner)
+
+
 def _add_conf_property(cls, section, key):
     ''' Binds two lazy properties to cls: _key and _section__key.
     Upon first access, those properties assign the config value for the
     corresponding key to __dict__[key].
+    The instance is registered as a reader of the key, so the cached
+    value is discarded when Configurations.reload() detects a change.
     '''
-    getter = lambda self: Config[section][key]
+    def getter(self):
+        Config.register_reader(section, key, self)
+        return Config[section][key]
     simple_name = '_{}'.format(key)
     complex_name = '_{}__{}'.format(section, key)
     for name in [simple_name, complex_name]:
-        setattr(cls, name, lazy_property(getter, name=name))
+        setattr(cls, name, _config_property(getter, section, key,
+                                            name=name))
 
 
 def configurable(**sections):
@@ -655,7 +1602,8 @@ def reset_config():
 from tek.config.options import (ListConfigOption, UnicodeConfigOption,
                                 PathConfigOption, PathListConfigOption,
                                 FileSizeConfigOption, IntConfigOption,
-                                FloatConfigOption, DictConfigOption)
+                                FloatConfigOption, DictConfigOption,
+                                register_option_type)
 from tek.config.errors import ConfigError
 
 
@@ -663,4 +1611,5 @@ __all__ = ['ConfigClient', 'Configurations', 'configurable',
            'lazy_configurable', 'ListConfigOption',
            'UnicodeConfigOption', 'PathConfigOption', 'PathListConfigOption',
            'FileSizeConfigOption', 'IntConfigOption', 'FloatConfigOption',
-           'DictConfigOption', 'ConfigError', 'reset_config']
+           'DictConfigOption', 'ConfigError', 'reset_config',
+           'register_option_type']
@@ -0,0 +1,90 @@
+''' On-disk cache of the state created by Configurations.setup.
+The cache is keyed on the setup parameters, the config home, which
+determines the candidate config files, and the modification times of the
+config modules and the registered config files, so a warm startup
+needs neither to import the config modules nor to parse any files.
+'''
+import os
+import sys
+import pickle
+
+from tek import logger
+from tek.config.files import file_stat
+from tek.config.state import resolved_state, install_state
+
+# bumped when the layout of the cached state changes
+FORMAT = 5
+
+
+def _module_files(metadata):
+    for name in metadata:
+        module = sys.modules.get('{}.config'.format(name))
+        yield getattr(module, '__file__', None)
+
+
+def _fingerprint(paths):
+    return dict((path, file_stat(path)) for path in paths)
+
+
+def _key(conf, names, files):
+    from tek.config import config_home
+    return dict(format=FORMAT, names=tuple(names), files=files,
+                allow_files=conf.allow_files, config_home=config_home())
+
+
+def store(conf, path, names, files):
+    ''' Write the current state of conf to path.
+    Failures are logged and otherwise ignored, as the cache is merely an
+    optimization.
+    '''
+    modules = list(_module_files(conf.metadata))
+    if None in modules:
+        logger.debug('config cache: module file unknown, not storing')
+        return
+    config_files = set(f for fac in conf._factories.values()
+                       for f in fac.files)
+    data = dict(
+        key=_key(conf, names, files),
+        modules=_fingerprint(modules),
+        config_files=_fingerprint(config_files),
+        state=resolved_state(conf),
+    )
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.debug('config cache: could not store state: {}'.format(e))
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _valid(data, key):
+    return (data.get('key') == key and
+            all(file_stat(p) == s for p, s in data['modules'].items()) and
+            all(file_stat(p) == s for p, s in data['config_files'].items()))
+
+
+def load(conf, path, names, files):
+    ''' Install the cached state in conf if path contains a cache that
+    matches the parameters and whose files are unchanged.
+    Return whether the cache was used.
+    '''
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.debug('config cache: could not load {}: {}'.format(path, e))
+        return False
+    if not _valid(data, _key(conf, names, files)):
+        return False
+    install_state(conf, data['state'])
+    return True
+
+__all__ = ['store', 'load']
@@ -0,0 +1,59 @@
+''' Process-wide cache of parsed config files.
+Several aliases usually register the same standard files, so each file
+is parsed only once and reused as long as it is unchanged on disk.
+'''
+import os
+import configparser
+
+# parsed config files by absolute path, as tuples of the stat signature
+# they were parsed with and a dict of sections
+_parsed_files = {}
+
+# ensures that DEFAULT is parsed like a regular section, so it can be
+# merged into the target parser by read_dict
+_no_default_section = '\0'
+
+
+def file_stat(path):
+    ''' Return a signature of path that changes whenever the file is
+    modified or replaced, or None if it doesn't exist.
+    '''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    else:
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def parse_config_file(path):
+    ''' Return the stat signature of the file at path and its raw
+    contents as a dict of sections, suitable for
+    ConfigParser.read_dict.
+    If the file doesn't exist, (None, {}) is returned; if it can't be
+    read, like a directory or a file without permission, it is treated
+    as empty.
+    '''
+    stat = file_stat(path)
+    if stat is None:
+        return None, {}
+    cached = _parsed_files.get(path)
+    if cached is not None and cached[0] == stat:
+        return cached
+    parser = configparser.RawConfigParser(
+        default_section=_no_default_section)
+    try:
+        with open(path) as f:
+            parser.read_file(f, path)
+    except OSError:
+        return stat, {}
+    sections = dict((name, dict(parser.items(name)))
+                    for name in parser.sections())
+    _parsed_files[path] = stat, sections
+    return stat, sections
+
+
+def clear_file_cache():
+    _parsed_files.clear()
+
+__all__ = ['file_stat', 'parse_config_file', 'clear_file_cache']
@@ -1,6 +1,12 @@
 import re
+import os
+import copy
+import threading
+import functools
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from os.path import expandvars
-from pathlib import Path
+from pathlib import Path, PurePath
 from typing import Iterable
 
 from tek import logger
@@ -8,6 +14,11 @@ from tek.config.errors import ConfigValueError, ConfigTypeError
 
 from tryp import List, _, Boolean
 
+# ConfigOption subclasses used to wrap plain config values, by value type
+_option_types = {}
+# memoized results of option_type, including unregistered subclasses
+_option_type_cache = {}
+
 
 def boolify(value):
     """ Return a string's boolean value if it is a string and "true" or
@@ -19,26 +30,245 @@ def boolify(value):
         return bool(value)
 
 
+class ParseCache(object):
+    ''' Bounded LRU cache of the values that TypedConfigOption.set
+    creates from strings, keyed by option class, parse parameters and
+    the string.
+    Only values made of immutable scalars are cached, and containers are
+    copied when they are stored and looked up, so options never share a
+    mutable value.
+    '''
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        ''' Return a tuple of a bool indicating whether key was found
+        and the cached value.
+        '''
+        with self._lock:
+            try:
+                value = self._values[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self._values.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def store(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._values), maxsize=self.maxsize)
+
+parse_cache = ParseCache()
+
+# values that may be shared between options
+_immutable_types = (str, bytes, int, float, complex, bool, type(None),
+                    PurePath, Boolean)
+
+
+def _cacheable(value):
+    ''' Whether value is an immutable scalar or a list, set or dict of
+    them.
+    Lists of ConfigOptions, like those of ListConfigOption with an
+    element_type, are excluded, as their elements are mutable and may
+    depend on the environment, like PathConfigOption.
+    '''
+    if isinstance(value, _immutable_types):
+        return True
+    if isinstance(value, dict):
+        return all(isinstance(k, _immutable_types) and
+                   isinstance(v, _immutable_types)
+                   for k, v in value.items())
+    if isinstance(value, (list, set)):
+        return all(isinstance(e, _immutable_types) for e in value)
+    return False
+
+
+def _copy(value):
+    return (value if isinstance(value, _immutable_types) else
+            copy.copy(value))
+
+
+def parse_cached(set):
+    ''' Decorator for TypedConfigOption.set implementations.
+    If the argument is a string and the option's parse_params are
+    hashable, the resulting value is taken from or stored in
+    parse_cache, if it is cacheable.
+    '''
+    @functools.wraps(set)
+    def wrapper(self, value):
+        if not isinstance(value, str):
+            return set(self, value)
+        key = type(self), self.parse_params, value
+        try:
+            found, cached = parse_cache.lookup(key)
+        except TypeError:
+            return set(self, value)
+        if found:
+            self.value = _copy(cached)
+        else:
+            set(self, value)
+            if _cacheable(self.value):
+                parse_cache.store(key, _copy(self.value))
+    return wrapper
+
+
+class GlobExpander(object):
+    ''' Expands path patterns with Path.glob.
+    Results are cached per pattern until the mtime of the pattern's
+    parent directory changes. Multiple patterns that aren't cached are
+    expanded concurrently in a thread pool, which helps on slow network
+    file systems.
+    '''
+
+    def __init__(self, workers=8, maxsize=1024):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _cached(self, pattern, mtime):
+        with self._lock:
+            entry = self._results.get(pattern)
+            if entry is not None and entry[0] == mtime:
+                self._results.move_to_end(pattern)
+                return entry[1]
+
+    def _glob(self, pattern, mtime):
+        paths = list(pattern.parent.glob(pattern.name))
+        with self._lock:
+            self._results[pattern] = mtime, paths
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return paths
+
+    def _mtime(self, pattern):
+        try:
+            return os.stat(str(pattern.parent)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers)
+            return self._executor
+
+    def expand(self, patterns):
+        ''' Return a List of all paths matching the Path objects in
+        patterns, in order.
+        '''
+        results = []
+        pending = []
+        for pattern in patterns:
+            mtime = self._mtime(pattern)
+            paths = [] if mtime is None else self._cached(pattern, mtime)
+            if paths is None:
+                pending.append((len(results), pattern, mtime))
+            results.append(paths)
+        if len(pending) == 1:
+            i, pattern, mtime = pending[0]
+            results[i] = self._glob(pattern, mtime)
+        elif pending:
+            futures = [(i, self._pool().submit(self._glob, pattern, mtime))
+                       for i, pattern, mtime in pending]
+            for i, future in futures:
+                results[i] = future.result()
+        return List.wrap(path for paths in results for path in paths)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+glob_expander = GlobExpander()
+
+
+# The parameters of a ConfigOption that don't change with its value.
+# Instances are interned, so options with equal parameters share one,
+# and copies of an option share it with the original.
+OptionMeta = namedtuple('OptionMeta', [
+    'positional', 'short', 'help', 'value_type', 'factory', 'splitchar',
+    'element_type', 'no', 'no_switch', 'key_type', 'dictvalue_type'])
+OptionMeta.__new__.__defaults__ = (None, None, '') + (None,) * 8
+_option_metas = {}
+
+
+def _intern_meta(meta):
+    try:
+        return _option_metas.setdefault(meta, meta)
+    except TypeError:
+        return meta
+
+
+def _meta_field(name):
+    ''' Property for the OptionMeta field name of a ConfigOption.
+    Assigning replaces the option's OptionMeta with an updated one.
+    '''
+    def get(self):
+        return getattr(self._meta, name)
+
+    def set(self, value):
+        self._update_meta(**{name: value})
+    return property(get, set)
+
+
 class ConfigOption(object):
+    __slots__ = ('_meta', 'value')
 
     def __init__(self, positional=None, short=None, **params):
-        self.positional = positional
-        self.short = short
+        self._update_meta(positional=positional, short=short)
         self.set_argparse_params(**params)
 
+    positional = _meta_field('positional')
+    short = _meta_field('short')
+    help = _meta_field('help')
+    _help = _meta_field('help')
+
+    def _update_meta(self, **fields):
+        meta = getattr(self, '_meta', None) or OptionMeta()
+        self._meta = _intern_meta(meta._replace(**fields))
+
     def set_argparse_params(self, help=''):
-        self._help = help
-        self.help = help
+        self._update_meta(help=help)
 
     @property
     def argparse_params(self):
         p = dict()
-        for name in ['help']:
-            value = getattr(self, '_' + name, None)
-            if value:
-                p[name] = value
+        if self._meta.help:
+            p['help'] = self._meta.help
         return p
 
+    def __copy__(self):
+        ''' Copy the value, sharing the OptionMeta. '''
+        other = object.__new__(type(self))
+        other._meta = self._meta
+        try:
+            other.value = self.value
+        except AttributeError:
+            pass
+        if hasattr(self, '__dict__'):
+            other.__dict__.update(self.__dict__)
+        return other
+
     def set_from_co(self, other):
         self.set_argparse_params(**other.argparse_params)
         if other.positional is not None:
@@ -57,6 +287,7 @@ class TypedConfigOption(ConfigOption):
     into a ConfigDict, setting a value is passed to the set() method,
     which then creates an object from the parameter from the config.
     """
+    __slots__ = ()
 
     def __init__(self, value_type, defaultvalue, factory=None, **params):
         """ Construct a TypedConfigOption.
@@ -66,11 +297,21 @@ class TypedConfigOption(ConfigOption):
             is set.
             @type defaultvalue: value_type
         """
-        self.value_type = value_type
-        self._factory = factory
+        self._update_meta(value_type=value_type, factory=factory)
         self.set(defaultvalue)
         ConfigOption.__init__(self, **params)
 
+    value_type = _meta_field('value_type')
+    _factory = _meta_field('factory')
+
+    @property
+    def parse_params(self):
+        ''' The attributes that determine the value parsed from a
+        string.
+        '''
+        return self.value_type, self._factory
+
+    @parse_cached
     def set(self, args):
         """ Assign args as the config object's value.
         If args is not of the value_type of the config object, it is
@@ -111,32 +352,43 @@ class BoolConfigOption(TypedConfigOption):
     """ Specialization of TypedConfigOption for booleans, as they must
     be parsed from strings differently.
     """
+    __slots__ = ()
 
     def __init__(self, defaultvalue=False, no=None, no_switch=None, **params):
+        self._update_meta(no=no, no_switch=no_switch)
         TypedConfigOption.__init__(self, Boolean, defaultvalue, **params)
-        self.no = no
-        self.no_switch = no_switch
+
+    no = _meta_field('no')
+    no_switch = _meta_field('no_switch')
 
     def set_from_co(self, other):
         if other.no is not None:
-            self.no = other.no
-            self.no_switch = other.no_switch
+            self._update_meta(no=other.no, no_switch=other.no_switch)
         TypedConfigOption.set_from_co(self, other)
 
+    @parse_cached
     def set(self, arg):
         super(BoolConfigOption, self).set(boolify(arg))
 
 
 class ListConfigOption(TypedConfigOption):
+    __slots__ = ()
 
     def __init__(self, defaultvalue=None, splitchar=',', element_type=None,
                  **params):
         if defaultvalue is None:
             defaultvalue = []
-        self._splitchar = splitchar
-        self._element_type = element_type
+        self._update_meta(splitchar=splitchar, element_type=element_type)
         super().__init__(List, defaultvalue, factory=List.wrap, **params)
 
+    _splitchar = _meta_field('splitchar')
+    _element_type = _meta_field('element_type')
+
+    @property
+    def parse_params(self):
+        return self._splitchar, self._element_type
+
+    @parse_cached
     def set(self, value):
         if isinstance(value, str):
             value = value.split(self._splitchar)
@@ -158,6 +410,11 @@ class ListConfigOption(TypedConfigOption):
 
 
 class PathListConfigOption(ListConfigOption):
+    ''' A list of path patterns.
+    The value holds the patterns, which are expanded lazily by
+    glob_expander when the effective value is read.
+    '''
+    __slots__ = ()
 
     def __init__(self, *a, **kw):
         t = PathConfigOption
@@ -165,30 +422,35 @@ class PathListConfigOption(ListConfigOption):
 
     def set(self, value):
         super().set(value)
-        glob = lambda a: a.parent.glob(a.name)
-        self.value = List.wrap(self.value) / _.value // glob
+        self.value = List.wrap(self.value) / _.value
 
     @property
     def effective_value(self):
-        return self.value
+        return glob_expander.expand(self.value)
 
 
 class UnicodeConfigOption(TypedConfigOption):
+    __slots__ = ()
 
     def __init__(self, default, **params):
         TypedConfigOption.__init__(self, str, default, **params)
 
 
 class PathConfigOption(TypedConfigOption):
+    __slots__ = ()
 
     def __init__(self, path=None, **params):
         super().__init__(Path, path or Path.cwd(), **params)
 
     def set(self, path):
+        ''' Not cached, since the value depends on the working
+        directory and the environment variables.
+        '''
         self.value = Path(expandvars(str(path))).expanduser().absolute()
 
 
 class NumericalConfigOption(TypedConfigOption):
+    __slots__ = ()
 
     def __init__(self, defaultvalue=-1, value_type=int, **params):
         super(NumericalConfigOption, self).__init__(value_type, defaultvalue,
@@ -196,6 +458,7 @@ class NumericalConfigOption(TypedConfigOption):
 
 
 class IntConfigOption(NumericalConfigOption):
+    __slots__ = ()
 
     def __init__(self, defaultvalue=-1, **params):
         super(IntConfigOption, self).__init__(defaultvalue=defaultvalue,
@@ -203,6 +466,7 @@ class IntConfigOption(NumericalConfigOption):
 
 
 class FloatConfigOption(NumericalConfigOption):
+    __slots__ = ()
 
     def __init__(self, defaultvalue=-1., **params):
         super(FloatConfigOption, self).__init__(defaultvalue=defaultvalue,
@@ -210,6 +474,7 @@ class FloatConfigOption(NumericalConfigOption):
 
 
 class FileSizeConfigOption(FloatConfigOption):
+    __slots__ = ()
     _prefixes = ['', 'k', 'm', 'g', 't', 'p']
     _prefix_string = ''.join(_prefixes)
     _regex = re.compile('(\d+(?:\.\d+)?)\s*([{}])b?$'.format(_prefix_string),
@@ -218,31 +483,36 @@ class FileSizeConfigOption(FloatConfigOption):
     def __init__(self, defaultvalue=-1, **params):
         super(FileSizeConfigOption, self).__init__(defaultvalue, **params)
 
+    @parse_cached
     def set(self, value):
         if isinstance(value, str):
             m = self._regex.match(value)
             if not m:
-                raise CValueError(FileSizeConfigOption, value)
+                raise ConfigValueError(FileSizeConfigOption, value)
             value, prefix = m.groups()
-            try:
-                pass
-            except IndexError:
-                raise CValueError(FileSizeConfigOption, value)
             exponent = 3 * self._prefixes.index(prefix.lower())
             value = float(value) * (10 ** exponent)
         super(FileSizeConfigOption, self).set(value)
 
 
 class DictConfigOption(TypedConfigOption):
+    __slots__ = ()
 
     def __init__(self, defaultvalue=None, key_type=str,
                  dictvalue_type=str, **params):
         defaultvalue = defaultvalue or dict()
-        self.key_type = key_type
-        self.dictvalue_type = dictvalue_type
+        self._update_meta(key_type=key_type, dictvalue_type=dictvalue_type)
         super(DictConfigOption, self).__init__(value_type=dict,
                                                defaultvalue=defaultvalue)
 
+    key_type = _meta_field('key_type')
+    dictvalue_type = _meta_field('dictvalue_type')
+
+    @property
+    def parse_params(self):
+        return self.key_type, self.dictvalue_type
+
+    @parse_cached
     def set(self, value):
         sanitize = lambda s: s.replace('\\', '')
         if isinstance(value, str):
@@ -253,6 +523,36 @@ class DictConfigOption(TypedConfigOption):
                           for k, v in items))
         super(DictConfigOption, self).set(value)
 
+
+def register_option_type(value_type, option_type):
+    ''' Use option_type to wrap config values of value_type and its
+    subclasses, unless a more specific type is registered.
+    option_type is called with the value as sole argument.
+    '''
+    _option_types[value_type] = option_type
+    _option_type_cache.clear()
+
+
+def option_type(value_type):
+    ''' Return the option class registered for the nearest type in the
+    MRO of value_type, or None.
+    '''
+    try:
+        return _option_type_cache[value_type]
+    except KeyError:
+        typ = next((_option_types[t] for t in value_type.__mro__
+                    if t in _option_types), None)
+        _option_type_cache[value_type] = typ
+        return typ
+
+register_option_type(bool, BoolConfigOption)
+register_option_type(int, IntConfigOption)
+register_option_type(float, FloatConfigOption)
+register_option_type(list, ListConfigOption)
+register_option_type(dict, DictConfigOption)
+
 __all__ = ['BoolConfigOption', 'ListConfigOption', 'UnicodeConfigOption',
            'PathConfigOption', 'PathListConfigOption', 'FileSizeConfigOption',
-           'IntConfigOption', 'FloatConfigOption', 'DictConfigOption']
+           'IntConfigOption', 'FloatConfigOption', 'DictConfigOption',
+           'register_option_type', 'option_type', 'parse_cache',
+           'glob_expander']
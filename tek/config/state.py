@@ -0,0 +1,136 @@
+import copy
+import pickle
+import weakref
+import functools
+import importlib
+
+
+class ConfigState(object):
+    ''' The state of a Configurations class at one point in time.
+    The layers of each section are referenced rather than copied, since
+    published layers are never modified. Restoring therefore only does
+    work for sections and factories that changed in the meantime.
+    '''
+
+    def __init__(self, conf):
+        self.configs = dict(conf._configs)
+        self.layers = dict((section, config.snapshot.layers)
+                           for section, config in self.configs.items())
+        self.factories = dict(conf._factories)
+        self.factory_states = dict((alias, _factory_state(factory))
+                                   for alias, factory in
+                                   self.factories.items())
+        self.metadata = dict(conf.metadata)
+        self.pending_clients = dict((name, weakref.WeakSet(clients))
+                                    for name, clients
+                                    in conf._pending_clients.items())
+        self.configurables = set(conf._configurables)
+        self.cli_config = conf._cli_config
+        self.cli_short_options = dict(conf._cli_short_options)
+        self.cli_params = dict(conf._cli_params)
+        self.env_config = conf._env_config
+        self.allow_files = conf.allow_files
+        self.allow_override = conf.allow_override
+
+    def restore(self, conf):
+        for section, config in self.configs.items():
+            layers = self.layers[section]
+            if any(a is not b for a, b in zip(config.layers, layers)):
+                changed = config.restore_layers(layers)
+                conf.reset_readers(section, changed)
+        for alias, factory in self.factories.items():
+            state = self.factory_states[alias]
+            if _changed(factory, state):
+                _set_factory_state(factory, state)
+        conf._configs = dict(self.configs)
+        conf._factories = dict(self.factories)
+        conf.metadata = dict(self.metadata)
+        conf._pending_clients = dict((name, weakref.WeakSet(clients))
+                                     for name, clients
+                                     in self.pending_clients.items())
+        for cls in conf._configurables - self.configurables:
+            if hasattr(cls, '__conf_init__'):
+                cls.__init__ = cls.__conf_init__
+        conf._configurables = set(self.configurables)
+        conf._cli_config = self.cli_config
+        conf._cli_short_options = dict(self.cli_short_options)
+        conf._cli_params = dict(self.cli_params)
+        conf._cli_parsers = {}
+        conf._env_config = self.env_config
+        conf.allow_files = self.allow_files
+        conf.allow_override = self.allow_override
+
+
+def _call_reset_config(name):
+    module = importlib.import_module('{}.config'.format(name))
+    return module.reset_config()
+
+
+def resolved_state(conf):
+    ''' Return a picklable dict of the sections of conf with all their
+    layers, the factories, the metadata without the reset_config
+    functions, and the cli settings.
+    '''
+    metadata = dict((name, dict((k, v) for k, v in m.items() if k != 'func'))
+                    for name, m in conf.metadata.items())
+    return dict(
+        metadata=metadata,
+        configs=conf._configs,
+        factories=conf._factories,
+        cli_config=conf._cli_config,
+        cli_short_options=conf._cli_short_options,
+        cli_params=conf._cli_params,
+        env_config=conf._env_config,
+    )
+
+
+def install_state(conf, state):
+    ''' Replace the state of conf with a dict created by
+    resolved_state.
+    The reset_config functions are imported only if reset() is called.
+    '''
+    conf.clear()
+    conf.metadata = state['metadata']
+    for name, metadata in conf.metadata.items():
+        metadata['func'] = functools.partial(_call_reset_config, name)
+    conf._configs = state['configs']
+    conf._factories = state['factories']
+    conf._cli_config = state['cli_config']
+    conf._cli_short_options.update(state['cli_short_options'])
+    conf._cli_params.update(state['cli_params'])
+    conf._env_config = state['env_config']
+    conf.notify_all_clients()
+
+
+def export_state(conf):
+    ''' Pickle the resolved state of conf, including cli values and
+    overrides, for installation in another process with
+    import_state.
+    '''
+    return pickle.dumps(resolved_state(conf), pickle.HIGHEST_PROTOCOL)
+
+
+def import_state(conf, data):
+    install_state(conf, pickle.loads(data))
+
+
+def _factory_state(factory):
+    return dict(files=list(factory.files), stats=dict(factory._stats),
+                sections=set(factory.sections),
+                parser=copy.deepcopy(factory.config_parser))
+
+
+def _changed(factory, state):
+    return (factory.files != state['files'] or
+            factory._stats != state['stats'] or
+            factory.sections != state['sections'])
+
+
+def _set_factory_state(factory, state):
+    factory.files = list(state['files'])
+    factory._stats = dict(state['stats'])
+    factory.sections = set(state['sections'])
+    factory.config_parser = copy.deepcopy(state['parser'])
+
+__all__ = ['ConfigState', 'resolved_state', 'install_state', 'export_state',
+           'import_state']
@@ -0,0 +1,128 @@
+''' Opt-in instrumentation of config lookups, enabled with
+Configurations.instrument().
+'''
+import time
+import threading
+
+from tek.config import ConfigAccessor
+
+
+class InstrumentedAccessor(ConfigAccessor):
+    ''' ConfigAccessor that counts its calls and measures the duration
+    of every sample_rate-th one.
+    '''
+
+    def __init__(self, config, key, sample_rate):
+        super().__init__(config, key)
+        self.sample_rate = sample_rate
+        self.reads = 0
+        self.samples = 0
+        self.sampled_time = 0.0
+        self.max_time = 0.0
+
+    def __call__(self):
+        self.reads += 1
+        if self.reads % self.sample_rate:
+            return ConfigAccessor.__call__(self)
+        start = time.perf_counter()
+        value = ConfigAccessor.__call__(self)
+        elapsed = time.perf_counter() - start
+        self.samples += 1
+        self.sampled_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        return value
+
+
+class ConfigStats(object):
+    ''' Read counts and sampled read latencies per key, and the number
+    and duration of updates and option resolutions per Configuration.
+    Read counts are not synchronized and may miss concurrent reads.
+    '''
+
+    def __init__(self, sample_rate=100):
+        self.sample_rate = sample_rate
+        self.accessors = []
+        # [count, seconds] by Configuration
+        self.updates = dict()
+        self.resolves = dict()
+        self._lock = threading.Lock()
+
+    def accessor(self, config, key):
+        accessor = InstrumentedAccessor(config, key, self.sample_rate)
+        with self._lock:
+            self.accessors.append(accessor)
+        return accessor
+
+    def _record(self, timings, config, elapsed):
+        with self._lock:
+            entry = timings.setdefault(config, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def record_update(self, config, elapsed):
+        self._record(self.updates, config, elapsed)
+
+    def resolve(self, config, snapshot, key):
+        ''' Resolve key in snapshot, recording the duration. '''
+        start = time.perf_counter()
+        option = snapshot.resolve(key)
+        self._record(self.resolves, config, time.perf_counter() - start)
+        return option
+
+    def report(self, configs):
+        ''' Return a dict of the statistics of the Configurations in
+        configs, a dict by section name:
+        'reads' is a list of dicts with section, key, reads, samples and
+        the mean and max sampled latency in seconds, most read first.
+        'updates' and 'resolves' map section names to dicts of count
+        and time in seconds.
+        '''
+        sections = dict((config, name) for name, config in configs.items())
+        reads = dict()
+        with self._lock:
+            accessors = list(self.accessors)
+            timings = dict(updates=dict(self.updates),
+                           resolves=dict(self.resolves))
+        for accessor in accessors:
+            section = sections.get(accessor._config)
+            if section is None:
+                continue
+            entry = reads.setdefault((section, accessor.key), dict(
+                section=section, key=accessor.key, reads=0, samples=0,
+                time=0.0, max_latency=0.0))
+            entry['reads'] += accessor.reads
+            entry['samples'] += accessor.samples
+            entry['time'] += accessor.sampled_time
+            entry['max_latency'] = max(entry['max_latency'],
+                                       accessor.max_time)
+        for entry in reads.values():
+            sampled = entry.pop('time')
+            entry['mean_latency'] = (sampled / entry['samples']
+                                     if entry['samples'] else 0.0)
+        report = dict(reads=sorted(reads.values(), key=lambda e: -e['reads']))
+        for name, values in timings.items():
+            report[name] = dict(
+                (sections[config], dict(count=count, time=elapsed))
+                for config, (count, elapsed) in values.items()
+                if config in sections)
+        return report
+
+
+def format_report(report, limit=20):
+    ''' Render the limit most read keys and the update and resolve
+    timings of a report as text.
+    '''
+    lines = ['config reads:']
+    for entry in report['reads'][:limit]:
+        lines.append('  {section}.{key}: {reads} reads, {mean:.2f}us mean,'
+                     ' {max:.2f}us max'.format(
+                         mean=entry['mean_latency'] * 1e6,
+                         max=entry['max_latency'] * 1e6, **entry))
+    for name in ['updates', 'resolves']:
+        lines.append('config {}:'.format(name))
+        for section, entry in sorted(report[name].items()):
+            lines.append('  {}: {} in {:.2f}ms'.format(
+                section, entry['count'], entry['time'] * 1e3))
+    return '\n'.join(lines)
+
+__all__ = ['ConfigStats', 'InstrumentedAccessor', 'format_report']
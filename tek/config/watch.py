@@ -0,0 +1,98 @@
+import os
+import threading
+
+from tek import logger
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+class ConfigWatcher(threading.Thread):
+    ''' Calls reload() on a Configurations class when its config files
+    change.
+    If inotify_simple is installed, the directories of the files are
+    watched with inotify, otherwise the files are polled every
+    'interval' seconds.
+    '''
+
+    def __init__(self, conf, interval=1.):
+        threading.Thread.__init__(self, name='ConfigWatcher', daemon=True)
+        self._conf = conf
+        self._interval = interval
+        self._running = True
+        self._stopped = threading.Event()
+        self._inotify = None
+        self._watched = set()
+
+    @property
+    def _dirs(self):
+        return set(os.path.dirname(path)
+                   for factory in list(self._conf._factories.values())
+                   for path in factory.files)
+
+    def _wait(self):
+        if self._inotify is None:
+            self._stopped.wait(self._interval)
+        else:
+            for d in self._dirs - self._watched:
+                try:
+                    self._inotify.add_watch(d, self._mask)
+                except OSError:
+                    continue
+                self._watched.add(d)
+            self._inotify.read(timeout=int(self._interval * 1000))
+
+    def run(self):
+        if INotify is not None:
+            self._inotify = INotify()
+            self._mask = (flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE |
+                          flags.DELETE)
+        try:
+            while self._running:
+                self._wait()
+                if self._running:
+                    try:
+                        self._conf.reload()
+                    except Exception as e:
+                        logger.error('config reload failed: {}'.format(e))
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+
+    def stop(self):
+        self._running = False
+        self._stopped.set()
+
+class ConfigReloader(threading.Thread):
+    ''' Calls reload() on a Configurations class in its own thread after
+    request() has been called.
+    Signal handlers use it, since a reload run in the handler would
+    join a write of the interrupted thread, whose lock is reentrant.
+    '''
+
+    def __init__(self, conf):
+        threading.Thread.__init__(self, name='ConfigReloader', daemon=True)
+        self._conf = conf
+        self._running = True
+        self._requested = threading.Event()
+
+    def request(self):
+        self._requested.set()
+
+    def run(self):
+        while self._running:
+            self._requested.wait()
+            self._requested.clear()
+            if self._running:
+                try:
+                    self._conf.reload()
+                except Exception as e:
+                    logger.error('config reload failed: {}'.format(e))
+
+    def stop(self):
+        self._running = False
+        self._requested.set()
+
+__all__ = ['ConfigWatcher', 'ConfigReloader']
@@ -1,8 +1,14 @@
+import os
 import sys
+import ast
 import pkgutil
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from tek import logger
 from tek.config import Config
+from tek.config.errors import ConfigLoadError
 
 
 def config_names(_dir):
@@ -14,15 +20,156 @@ def config_names(_dir):
                 yield pkg
 
 
-def write_pkg_config(_dir, outfile, alias):
-    sys.path[:0] = [_dir]
+def scan_config_names(_dir):
+    ''' Like config_names, but without importing any package.
+    Yield tuples of the names of the packages below _dir that contain a
+    config module and the module's file.
+    '''
+    def walk(path, prefix):
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            init = os.path.join(entry.path, '__init__.py')
+            if (entry.is_dir() and entry.name.isidentifier() and
+                    os.path.isfile(init)):
+                name = prefix + entry.name
+                config = os.path.join(entry.path, 'config.py')
+                if os.path.isfile(config):
+                    yield name, config
+                yield from walk(entry.path, name + '.')
+    return walk(_dir, '')
+
+
+_static_nodes = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)
+
+
+def _literal_return(func):
+    body = func.body
+    if (body and isinstance(body[0], ast.Expr) and
+            isinstance(body[0].value, ast.Constant)):
+        body = body[1:]
+    args = func.args
+    if (len(body) != 1 or not isinstance(body[0], ast.Return) or
+            args.args or args.vararg or args.kwonlyargs or args.kwarg):
+        raise ValueError('reset_config is not a literal')
+    value = body[0].value
+    return None if value is None else ast.literal_eval(value)
+
+
+def literal_config(path):
+    ''' Extract the metadata and the sections returned by reset_config
+    from the source of the config module at path.
+    Return None if the module contains statements other than imports,
+    definitions and literal assignments, or if reset_config doesn't
+    just return a literal.
+    '''
+    try:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        metadata = dict()
+        sections = None
+        found = False
+        for node in tree.body:
+            if (isinstance(node, ast.FunctionDef) and
+                    node.name == 'reset_config'):
+                sections = _literal_return(node)
+                found = True
+            elif isinstance(node, ast.Assign):
+                names = [t.id for t in node.targets
+                         if isinstance(t, ast.Name)]
+                if len(names) != len(node.targets):
+                    return None
+                if 'metadata' in names:
+                    metadata = ast.literal_eval(node.value)
+            elif not (isinstance(node, _static_nodes) or
+                      isinstance(node, ast.Expr) and
+                      isinstance(node.value, ast.Constant)):
+                return None
+    except (ValueError, TypeError, SyntaxError) as e:
+        logger.debug('{}: {}'.format(path, e))
+        return None
+    return (metadata, sections) if found else None
+
+
+def execute_config(_dir, name):
+    ''' Import the config module of package name from _dir and run its
+    reset_config with a cleared Configurations state.
+    Return its metadata and the defaults of all sections it defines,
+    whether registered directly or returned.
+    Intended to run in a worker process.
+    '''
+    if _dir not in sys.path:
+        sys.path.insert(0, _dir)
+    Config.allow_files = False
+    Config.allow_override = False
+    Config.clear()
+    module = Config._import_config(name)
+    func = getattr(module, 'reset_config', None)
+    if func is None:
+        text = 'Missing reset_config function for {}!'
+        raise ConfigLoadError(text.format(name))
+    returned = func() or dict()
+    sections = dict((section, dict(config.config_defaults))
+                    for section, config in Config._configs.items())
+    for section, defaults in returned.items():
+        sections.setdefault(section, dict()).update(defaults)
+    return dict(getattr(module, 'metadata', {})), sections
+
+
+def load_static_configs(_dir, workers=None):
+    ''' Add metadata for all config modules below _dir without importing
+    them in this process.
+    Literal configs are read with literal_config, the remaining ones
+    are executed concurrently in separate worker processes.
+    '''
+    found = list(scan_config_names(_dir))
+    results = dict()
+    pending = []
+    for name, path in found:
+        config = literal_config(path)
+        if config is None:
+            pending.append(name)
+        else:
+            results[name] = config
+    if pending:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context) as executor:
+            futures = [(name, executor.submit(execute_config, _dir, name))
+                       for name in pending]
+            for name, future in futures:
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.debug(e)
+    for name, _path in found:
+        if name in results:
+            metadata, sections = results[name]
+            func = functools.partial(dict, sections or dict())
+            Config.add_metadata(name, metadata, func)
+
+
+def write_pkg_config(_dir, outfile, alias, static=False, workers=None):
+    ''' Write the defaults of all sections with the given alias defined
+    by config modules below _dir to outfile.
+    If static is True, config modules are discovered and evaluated by
+    load_static_configs instead of being imported.
+    '''
+    _dir = str(_dir)
     Config.allow_files = False
     Config.allow_override = False
     Config.clear_metadata()
-    for name in config_names(_dir):
-        try:
-            Config.load_config(name)
-        except Exception as e:
-            logger.debug(e)
+    if static:
+        load_static_configs(_dir, workers)
+    else:
+        sys.path[:0] = [_dir]
+        for name in config_names(_dir):
+            try:
+                Config.load_config(name)
+            except Exception as e:
+                logger.debug(e)
     Config.reset(files=False, alias=[alias])
     Config.write_config(outfile)
+
+__all__ = ['write_pkg_config']
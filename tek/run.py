@@ -29,6 +29,7 @@ class SignalManager(metaclass=Singleton):
         if SignalManager._instance is not None:
             raise TException('Tried to instantiate singleton SignalManager!')
         self._handlers = dict()
+        self._persistent = set()
         self.exit_on_interrupt = True
 
     def sigint(self, handler=None):
@@ -36,10 +37,17 @@ class SignalManager(metaclass=Singleton):
             handler = lambda s, f: True
         self.add(signal.SIGINT, handler)
 
-    def add(self, signum, handler):
+    def add(self, signum, handler, persistent=False):
+        ''' Register handler for signum.
+        If persistent is True, the signal is not treated as an
+        interruption, so the handlers stay installed after it has been
+        received.
+        '''
         if threading.current_thread().name == 'MainThread':
             signal.signal(signum, self.handle)
         self._handlers.setdefault(signum, []).append(handler)
+        if persistent:
+            self._persistent.add(signum)
 
     def remove(self, handler):
         for sig in self._handlers.values():
@@ -49,6 +57,10 @@ class SignalManager(metaclass=Singleton):
                 pass
 
     def handle(self, signum, frame):
+        if signum in self._persistent:
+            for handler in reversed(self._handlers.get(signum, [])):
+                handler(signum, frame)
+            return
         logger.error('Interrupted by signal {}'.format(signum))
         for handler in reversed(self._handlers.get(signum, [])):
             handler(signum, frame)
@@ -15,6 +15,10 @@ Config.enable_lazy_class_attr = False
 
 __base_dir__ = None
 
+# Configurations states after Spec's config setup, by configs and
+# allow_files
+_config_states = {}
+
 
 class TestEnvError(Error):
     pass
@@ -92,9 +96,24 @@ class Spec(spec.Spec):
             shutil.rmtree(str(temp_path()), ignore_errors=True)
         if self._warnings:
             warnings.resetwarnings()
-        Config.allow_files = allow_files
-        Config.setup(*self._configs, files=allow_files)
-        Config.override('general', debug=True)
+        self._setup_config(allow_files)
+
+    def _setup_config(self, allow_files):
+        ''' Set up the configs only for the first test using them and
+        restore the resulting state for subsequent tests.
+        If allow_files is True, the configs are always set up, so that
+        changes of the config files and the config home are seen.
+        '''
+        key = tuple(self._configs)
+        state = None if allow_files else _config_states.get(key)
+        if state is None:
+            Config.allow_files = allow_files
+            Config.setup(*self._configs, files=allow_files)
+            Config.override('general', debug=True)
+            if not allow_files:
+                _config_states[key] = Config.save_state()
+        else:
+            Config.restore_state(state)
 
     def teardown(self, *a, **kw):
         warnings.simplefilter('ignore')
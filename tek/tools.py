@@ -5,13 +5,14 @@ import logging
 import threading
 import time
 import itertools
-import functools
 import tempfile
 import datetime
 import calendar
-from functools import wraps
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, wait,
+                                FIRST_COMPLETED)
 
 from tek.log import stdouthandler, logger
+from tek.util.memoize import memoized, memoized_class  # NOQA
 from tek.io.terminal import terminal
 
 from tryp.logging import log
@@ -308,68 +309,67 @@ def lists_uniq(lists):
     return list(set(sum(lists, [])))
 
 
-class _WrapThread(threading.Thread):
+def _call_chunk(func, chunk):
+    return [func(*args) for args in chunk]
 
-    def __init__(self, function):
-        threading.Thread.__init__(self)
-        self._function = function
-        self.result = None
 
-    def run(self):
-        self.result = self._function()
-
-
-def parallel_map(func, *a, **kw):
-    partials = [functools.partial(func, *args) for args in zip(*a)]
-    threads = list(map(_WrapThread, partials))
-    for thread in threads:
-        thread.start()
-    for thread in threads:
-        thread.join()
-    return [thread.result for thread in threads]
-
-
-def memoized(func):
-    init_lock = threading.Lock()
-
-    @wraps(func)
-    def wrapper(self, *a, **kw):
-        init_lock.acquire()
-        if not hasattr(self, '__memoized__'):
-            self.__memoized__ = dict()
-            self.__memoize_locks__ = dict()
-        if func not in self.__memoize_locks__:
-            self.__memoize_locks__[func] = threading.Lock()
-        init_lock.release()
-        self.__memoize_locks__[func].acquire()
-        calls = self.__memoized__.setdefault(func, {})
-        key = (a, tuple(kw.keys()), tuple(kw.values()))
-        if key not in calls:
-            calls[key] = func(self, *a, **kw)
-        self.__memoize_locks__[func].release()
-        return calls[key]
-    return wrapper
-
-
-def memoized_class(func):
-    lock = threading.Lock()
-    locks = dict()
-    _memoized = dict()
-
-    @wraps(func)
-    def wrapper(self, *a, **kw):
-        key = (a, tuple(kw.keys()), tuple(kw.values()))
-        lock.acquire()
-        if key not in locks:
-            locks[key] = threading.Lock()
-        lock.release()
-        spec_lock = locks[key]
-        spec_lock.acquire()
-        if key not in _memoized:
-            _memoized[key] = func(self, *a, **kw)
-        spec_lock.release()
-        return _memoized[key]
-    return wrapper
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    return iter(lambda: list(itertools.islice(iterator, size)), [])
+
+
+def _default_workers(processes):
+    cpus = os.cpu_count() or 1
+    return cpus if processes else min(32, cpus + 4)
+
+
+def iparallel_map(func, *iterables, workers=None, chunksize=1,
+                  processes=False, ordered=True):
+    ''' Generator applying func to the zipped elements of iterables in
+    a pool of at most workers threads, or processes if processes is
+    True, in which case func must be picklable.
+    The arguments are consumed lazily in chunks of chunksize elements,
+    at most twice as many chunks as workers are pending at a time.
+    Results are yielded in input order if ordered is True, otherwise in
+    the order in which their chunks complete.
+    An exception raised by func is raised by the generator. In that
+    case, and when the generator is closed early, the pending chunks
+    are cancelled; those already running are waited for.
+    '''
+    workers = workers or _default_workers(processes)
+    executor = (ProcessPoolExecutor if processes else
+                ThreadPoolExecutor)(workers)
+    chunks = _chunks(zip(*iterables), chunksize)
+    pending = collections.deque() if ordered else set()
+    add = pending.append if ordered else pending.add
+
+    def submit(count):
+        for chunk in itertools.islice(chunks, count):
+            add(executor.submit(_call_chunk, func, chunk))
+    try:
+        submit(2 * workers)
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+            results = [future.result() for future in done]
+            submit(len(done))
+            for chunk in results:
+                yield from chunk
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def parallel_map(func, *iterables, **kw):
+    ''' Return the list of results of func applied to the zipped
+    elements of iterables in a bounded pool.
+    See iparallel_map for the parameters.
+    '''
+    return list(iparallel_map(func, *iterables, **kw))
 
 
 def touch(_path):
@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import types
+import pickle
+import hashlib
+import sqlite3
+import threading
+
+from tek import logger
+
+# size limit of the database of a DiskMemoCache
+default_maxbytes = 64 * 2 ** 20
+
+
+def default_path():
+    from tek.config import config_home
+    return os.path.join(config_home(), 'tek', 'memoize.sqlite')
+
+
+def _hash_code(digest, code):
+    ''' Update digest with the bytecode, names and constants of code,
+    recursing into the code objects of nested functions, comprehensions
+    and classes, whose repr only contains their address.
+    '''
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+
+def function_version(func, version=None):
+    ''' Identify func by its qualified name, a digest of its code and the
+    Python version, so that stored results are invalidated when any of
+    them changes, and by version, for changes outside of func's code.
+    '''
+    code = getattr(func, '__code__', None)
+    digest = hashlib.sha256()
+    if code is not None:
+        _hash_code(digest, code)
+    return '{}.{}:{}:{}.{}:{}'.format(func.__module__, func.__qualname__,
+                                      digest.hexdigest()[:16],
+                                      sys.version_info[0],
+                                      sys.version_info[1], version)
+
+
+class DiskMemoCache(object):
+    ''' Persistent store of pickled values in an sqlite database, shared
+    between processes.
+    Values are stored under a digest of namespace and the pickled key.
+    Each write is a transaction, so readers never see partial values.
+    When the database exceeds maxbytes, or the namespace holds more than
+    maxsize values, the least recently used values are removed.
+    Keys or values that can't be pickled are computed without storing.
+    '''
+
+    def __init__(self, namespace, path=None, maxsize=None, ttl=None,
+                 maxbytes=default_maxbytes):
+        self.namespace = namespace
+        self._path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        ''' The database file, by default resolved on first use. '''
+        return self._path or default_path()
+
+    @property
+    def _db(self):
+        ''' The connection of the current thread. '''
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            path = self._path = self.path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, timeout=30)
+            with db:
+                db.execute('create table if not exists memo (digest text'
+                           ' primary key, namespace text, value blob,'
+                           ' size integer, accessed real, expires real)')
+                db.execute('create index if not exists memo_accessed on'
+                           ' memo (namespace, accessed)')
+            self._local.db = db
+        return db
+
+    def _digest(self, key):
+        data = pickle.dumps((self.namespace, key), protocol=4)
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key, compute):
+        ''' Return the value stored for key, or the result of compute(),
+        which is then stored.
+        '''
+        try:
+            digest = self._digest(key)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.debug('not memoizing unpicklable key: {}'.format(e))
+            return compute()
+        now = time.time()
+        with self._db as db:
+            row = db.execute('select value, expires from memo where'
+                             ' digest = ?', (digest,)).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                db.execute('update memo set accessed = ? where digest = ?',
+                           (now, digest))
+                try:
+                    value = pickle.loads(row[0])
+                except Exception as e:
+                    logger.debug('discarding unreadable value: {}'.format(e))
+                    db.execute('delete from memo where digest = ?',
+                               (digest,))
+                else:
+                    self.hits += 1
+                    return value
+        self.misses += 1
+        value = compute()
+        self._store(digest, value)
+        return value
+
+    def _store(self, digest, value):
+        try:
+            data = pickle.dumps(value, protocol=4)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.debug('not memoizing unpicklable value: {}'.format(e))
+            return
+        now = time.time()
+        expires = None if self.ttl is None else now + self.ttl
+        with self._db as db:
+            db.execute('insert or replace into memo values'
+                       ' (?, ?, ?, ?, ?, ?)', (digest, self.namespace, data,
+                                               len(data), now, expires))
+            self._evict(db)
+
+    def _evict(self, db):
+        ''' Remove the least recently used values until the limits are
+        met.
+        '''
+        removed = 0
+        if self.maxsize is not None:
+            removed += db.execute(
+                'delete from memo where digest in (select digest from memo'
+                ' where namespace = ? order by accessed desc limit -1'
+                ' offset ?)', (self.namespace, self.maxsize)).rowcount
+        total = db.execute('select coalesce(sum(size), 0) from'
+                           ' memo').fetchone()[0]
+        if total > self.maxbytes:
+            rows = db.execute('select digest, size from memo order by'
+                              ' accessed')
+            excess = []
+            for digest, size in rows:
+                if total <= self.maxbytes:
+                    break
+                excess.append((digest,))
+                total -= size
+            db.executemany('delete from memo where digest = ?', excess)
+            removed += len(excess)
+        self.evictions += removed
+
+    def __len__(self):
+        return self._db.execute('select count(*) from memo where'
+                                ' namespace = ?',
+                                (self.namespace,)).fetchone()[0]
+
+    def clear(self):
+        ''' Remove the values of the namespace and reset the
+        statistics.
+        '''
+        with self._db as db:
+            db.execute('delete from memo where namespace = ?',
+                       (self.namespace,))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, size=len(self),
+                    maxsize=self.maxsize, maxbytes=self.maxbytes)
+
+__all__ = ['DiskMemoCache', 'function_version', 'default_path']
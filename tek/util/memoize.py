@@ -0,0 +1,384 @@
+import time
+import asyncio
+import inspect
+import weakref
+import threading
+import functools
+from collections import OrderedDict
+
+# maxsize of the cache shared by all instances in memoized_class
+class_maxsize = 1024
+
+# separates the positional from the keyword arguments in cache keys
+_kwd_mark = object()
+
+
+def make_key(a, kw):
+    ''' Hashable cache key for the arguments of a call, independent of
+    the order of the keyword arguments.
+    '''
+    return a + (_kwd_mark,) + tuple(sorted(kw.items())) if kw else a
+
+
+class _Flight(object):
+    ''' A computation in progress, which concurrent callers for the same
+    key wait for.
+    '''
+
+    def __init__(self):
+        self.owner = threading.get_ident()
+        self.value = None
+        self.error = None
+        self._done = threading.Event()
+
+    def finish(self, value=None, error=None):
+        self.value = value
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class MemoCache(object):
+    ''' Thread-safe store of computed values with optional LRU and TTL
+    eviction.
+    The lock is only held for bookkeeping, so values for different keys
+    are computed concurrently. Concurrent calls for the same key are
+    coalesced into one computation, whose result or exception is shared
+    by all of them. Exceptions are not cached.
+    '''
+
+    def __init__(self, maxsize=None, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # (expiry time or None, value) by key, least recently used first
+        self._values = OrderedDict()
+        self._flights = dict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key, compute):
+        ''' Return the value stored for key, or the result of compute(),
+        which is then stored.
+        '''
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+                owner = True
+            else:
+                owner = False
+                self.coalesced += 1
+        if owner:
+            return self._compute(key, compute, flight)
+        elif flight.owner == threading.get_ident():
+            # a recursive call for the same key would wait for itself
+            return compute()
+        return flight.wait()
+
+    def _lookup(self, key):
+        ''' Return a tuple of a bool indicating whether a valid value is
+        stored for key and the value, removing it if it has expired.
+        Must be called with the lock held.
+        '''
+        entry = self._values.get(key)
+        if entry is not None:
+            if entry[0] is None or entry[0] > self._clock():
+                self._values.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            del self._values[key]
+            self.evictions += 1
+        return False, None
+
+    def _compute(self, key, compute, flight):
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._flights[key]
+            flight.finish(error=e)
+            raise
+        with self._lock:
+            del self._flights[key]
+            self._store(key, value)
+        flight.finish(value)
+        return value
+
+    def _store(self, key, value):
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        self._values[key] = expires, value
+        self._values.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            return entry is not None and (entry[0] is None or
+                                          entry[0] > self._clock())
+
+    def __len__(self):
+        return len(self._values)
+
+    def discard(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        ''' Remove all values and reset the statistics. '''
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.coalesced = 0
+
+    @property
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, coalesced=self.coalesced,
+                    size=len(self._values), maxsize=self.maxsize)
+
+
+class AsyncMemoCache(MemoCache):
+    ''' MemoCache for values computed by coroutines.
+    Concurrent awaits of the same key in an event loop share one task,
+    which is shielded from the cancellation of single callers. Its
+    result is stored once it completes; exceptions are not cached.
+    The lock is never held while waiting, so the loop isn't blocked.
+    '''
+
+    async def get(self, key, compute):
+        ''' Return the value stored for key, or the result of awaiting
+        compute(), which is then stored.
+        '''
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            task = self._flights.get((loop, key))
+            if task is None:
+                task = loop.create_task(compute())
+                self._flights[loop, key] = task
+                task.add_done_callback(
+                    functools.partial(self._finish, loop, key))
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if task is asyncio.current_task():
+            # a recursive call for the same key would wait for itself
+            return await compute()
+        return await asyncio.shield(task)
+
+    def _finish(self, loop, key, task):
+        with self._lock:
+            del self._flights[loop, key]
+            if not task.cancelled() and task.exception() is None:
+                self._store(key, task.result())
+
+
+def _cache_type(func):
+    return AsyncMemoCache if inspect.iscoroutinefunction(func) else MemoCache
+
+
+def _create_cache(func, maxsize, ttl, persistent, version):
+    ''' Create the cache for a decorated function, a DiskMemoCache in
+    the namespace of func's identity if persistent is True.
+    '''
+    if not persistent:
+        return _cache_type(func)(maxsize, ttl)
+    if inspect.iscoroutinefunction(func):
+        raise ValueError('persistent memoization of coroutine functions is'
+                         ' not supported: {}'.format(func.__qualname__))
+    from tek.util.disk_memoize import DiskMemoCache, function_version
+    return DiskMemoCache(function_version(func, version), maxsize=maxsize,
+                         ttl=ttl)
+
+
+class WeakMemoCache(object):
+    ''' MemoCaches by owner object, referenced weakly and by identity,
+    so owners need not be hashable and the values computed for an owner
+    are discarded when it is collected.
+    Owners that don't support weak references, like numbers and
+    strings, share a MemoCache keyed by owner and key. If they aren't
+    hashable either, like plain lists, values are computed without
+    caching.
+    '''
+
+    def __init__(self, maxsize=None, ttl=None, cache_type=MemoCache):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_type = cache_type
+        # (weakref to owner, MemoCache) by id of owner
+        self._caches = dict()
+        self._strong = cache_type(maxsize, ttl)
+        # reentrant, since the removal callbacks may run in a garbage
+        # collection triggered while the lock is held
+        self._lock = threading.RLock()
+
+    def _cache(self, owner):
+        ident = id(owner)
+        with self._lock:
+            entry = self._caches.get(ident)
+            if entry is None or entry[0]() is not owner:
+                remove = self._remover(ident)
+                try:
+                    ref = weakref.ref(owner, remove)
+                except TypeError:
+                    return None
+                entry = ref, self.cache_type(self.maxsize, self.ttl)
+                self._caches[ident] = entry
+            return entry[1]
+
+    def _remover(self, ident):
+        this = weakref.ref(self)
+
+        def remove(ref):
+            cache = this()
+            if cache is not None:
+                with cache._lock:
+                    if cache._caches.get(ident, (None,))[0] is ref:
+                        del cache._caches[ident]
+        return remove
+
+    def get(self, owner, key, compute):
+        ''' Return the value stored for key in the cache of owner, or
+        the result of compute(), which is then stored.
+        '''
+        cache = self._cache(owner)
+        if cache is None:
+            try:
+                hash(owner)
+            except TypeError:
+                return compute()
+            return self._strong.get((owner, key), compute)
+        return cache.get(key, compute)
+
+    def __len__(self):
+        return len(self._caches)
+
+    def clear(self):
+        with self._lock:
+            self._caches.clear()
+        self._strong.clear()
+
+    @property
+    def stats(self):
+        with self._lock:
+            caches = [cache for ref, cache in self._caches.values()]
+        stats = dict(self._strong.stats, owners=len(caches),
+                     maxsize=self.maxsize)
+        for cache in caches:
+            cache_stats = cache.stats
+            for name in ['hits', 'misses', 'evictions', 'coalesced', 'size']:
+                stats[name] += cache_stats[name]
+        return stats
+
+
+def memoize(func=None, maxsize=None, ttl=None, persistent=False,
+            version=None):
+    ''' Cache the results of func by its arguments in a MemoCache, which
+    is available as the attribute cache of the wrapper.
+    If func is a coroutine function, an AsyncMemoCache is used and the
+    wrapper returns an awaitable. This applies to memoized and
+    memoized_class as well.
+    If persistent is True, the results are stored in a DiskMemoCache
+    under config_home() and reused by later processes, as long as the
+    code of func and version are unchanged.
+    Can be used with or without parameters.
+    '''
+    if func is None:
+        return functools.partial(memoize, maxsize=maxsize, ttl=ttl,
+                                 persistent=persistent, version=version)
+    cache = _create_cache(func, maxsize, ttl, persistent, version)
+
+    @functools.wraps(func)
+    def wrapper(*a, **kw):
+        return cache.get(make_key(a, kw), lambda: func(*a, **kw))
+    wrapper.cache = cache
+    return wrapper
+
+
+def memo_cache(instance, method, maxsize=None, ttl=None,
+               cache_type=MemoCache):
+    ''' Return the MemoCache of instance for method, creating it as
+    cache_type with maxsize and ttl if necessary.
+    '''
+    caches = instance.__dict__.get('__memoized__')
+    if caches is None:
+        caches = instance.__dict__.setdefault('__memoized__', dict())
+    cache = caches.get(method)
+    if cache is None:
+        cache = caches.setdefault(method, cache_type(maxsize, ttl))
+    return cache
+
+
+def memoized(func=None, maxsize=None, ttl=None):
+    ''' Cache the results of a method by its arguments, separately for
+    each instance, in a MemoCache obtainable with memo_cache(instance,
+    wrapper).
+    Can be used with or without parameters.
+    '''
+    if func is None:
+        return functools.partial(memoized, maxsize=maxsize, ttl=ttl)
+    cache_type = _cache_type(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *a, **kw):
+        cache = memo_cache(self, wrapper, maxsize, ttl, cache_type)
+        return cache.get(make_key(a, kw), lambda: func(self, *a, **kw))
+    return wrapper
+
+
+def memoized_class(func=None, maxsize=class_maxsize, ttl=None, weak=False,
+                   persistent=False, version=None):
+    ''' Cache the results of a method by its arguments, shared by all
+    instances, in a MemoCache available as the attribute cache of the
+    wrapper, holding at most maxsize values.
+    If weak is True, the first positional argument is the owner of the
+    values computed for it, which are stored in a WeakMemoCache and
+    discarded with the owner.
+    If persistent is True, the results are stored on disk, like with
+    memoize.
+    Can be used with or without parameters.
+    '''
+    if func is None:
+        return functools.partial(memoized_class, maxsize=maxsize, ttl=ttl,
+                                 weak=weak, persistent=persistent,
+                                 version=version)
+    if weak and persistent:
+        raise ValueError('weak owners cannot be memoized persistently')
+    if weak:
+        cache = WeakMemoCache(maxsize, ttl, _cache_type(func))
+
+        @functools.wraps(func)
+        def wrapper(self, owner, *a, **kw):
+            return cache.get(owner, make_key(a, kw),
+                             lambda: func(self, owner, *a, **kw))
+    else:
+        cache = _create_cache(func, maxsize, ttl, persistent, version)
+
+        @functools.wraps(func)
+        def wrapper(self, *a, **kw):
+            return cache.get(make_key(a, kw), lambda: func(self, *a, **kw))
+    wrapper.cache = cache
+    return wrapper
+
+__all__ = ['MemoCache', 'AsyncMemoCache', 'WeakMemoCache', 'make_key',
+           'memoize', 'memo_cache', 'memoized', 'memoized_class']
@@ -1,11 +1,26 @@
+import os
 import sys
+import copy
+import gc
+import time
+import signal
+import shutil
+import tempfile
+import functools
+import threading
+from pathlib import Path
+from argparse import Namespace
 import sure  # NOQA
 
-from tek.test import Spec, fixture_path, temp_file
+from tek.test import Spec, fixture_path, temp_file, temp_dir, later
 from tek.config import (Config, configurable, ConfigClient, NoSuchSectionError,
                         NoSuchOptionError)
+from tek.config.errors import ConfigLoadError, ConfigValueError
 from tek.config.options import (ListConfigOption, FileSizeConfigOption,
-                                DictConfigOption)
+                                PathListConfigOption, PathConfigOption,
+                                BoolConfigOption,
+                                DictConfigOption, TypedConfigOption,
+                                register_option_type, parse_cache)
 from tek.config.write import write_pkg_config
 
 
@@ -58,6 +73,301 @@ class Config_(Spec):
         conf = ConfigClient('sec1')
         conf('key1').should.equal({'a:b': 'foo:moo', 'a,b': 'boo,zoo'})
 
+    def override(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+        conf = ConfigClient('sec1')
+        conf('key2').should.equal(['asdf'])
+        Config.override('sec1', key2='jkl;,qwer')
+        conf('key2').should.equal(['jkl;', 'qwer'])
+        conf('key1').should.equal('val1')
+        Config.override_defaults('sec1', key1='val2')
+        conf('key1').should.equal('val2')
+        conf('key2').should.equal(['jkl;', 'qwer'])
+
+    def snapshot(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+        snap = Config.snapshot('sec1')
+        Config.override('sec1', key1='val2', key2='jkl;')
+        snap['key1'].should.equal('val1')
+        snap['key2'].should.equal(['asdf'])
+        Config['sec1'].key2.should.equal(['jkl;'])
+        Config.snapshot('sec1').version.should.equal(snap.version + 1)
+
+    def batch(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1', key2='val2')
+        Config.register_config('test', 'sec2', key3='val3')
+        version = Config.snapshot('sec1').version
+        with Config.batch():
+            Config.override('sec1', key1='new1')
+            Config.override('sec1', key2='new2')
+            Config.override_defaults('sec1', key1='def1')
+            Config['sec1'].key1.should.equal('val1')
+        Config['sec1'].key1.should.equal('new1')
+        Config['sec1'].key2.should.equal('new2')
+        Config.snapshot('sec1').version.should.equal(version + 1)
+        Config.snapshot('sec2').version.should.equal(1)
+
+        def fail():
+            with Config.batch():
+                Config.override('sec2', key3='new3')
+                raise ValueError()
+        fail.when.called_with().should.throw(ValueError)
+        Config['sec2'].key3.should.equal('val3')
+        Config.override('sec2', key4='val4')
+        Config['sec2'].key3.should.equal('val3')
+
+    def invalid_values(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1=1)
+        Config.register_config('test', 'sec2', key2=2)
+        version = Config.snapshot('sec1').version
+        override = lambda: Config.override('sec1', key1='abc')
+        override.when.called_with().should.throw(ConfigValueError)
+        cli = lambda: Config.parse_cli(args=['--key2', '3', '--key1', 'abc'])
+        cli.when.called_with().should.throw(ConfigValueError)
+        env = lambda: Config.set_env_config(
+            environ=dict(SEC1_KEY1='abc', SEC2_KEY2='3'))
+        env.when.called_with().should.throw(ConfigValueError)
+
+        def batch():
+            with Config.batch():
+                Config.override('sec2', key2=4)
+                Config.override('sec1', key1='abc')
+        batch.when.called_with().should.throw(ConfigValueError)
+        Config['sec1'].key1.should.equal(1)
+        Config['sec2'].key2.should.equal(2)
+        Config.snapshot('sec1').version.should.equal(version)
+        Config.override('sec1', key1='5')
+        Config['sec1'].key1.should.equal(5)
+
+    def parse_cli(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+        Config.register_config('test', 'sec2', key3='val3')
+        Config.parse_cli(args=['--key1', 'cli1', '--key3', 'cli3'])
+        Config['sec1'].key1.should.equal('cli1')
+        Config['sec2'].key3.should.equal('cli3')
+        Config.parse_cli(args=['--key2', 'a,b'])
+        Config['sec1'].key2.should.equal(['a', 'b'])
+        len(Config._cli_parsers).should.equal(1)
+        section = Config.parse_cli(args=['sec2', '--key3', 'sub3'],
+                                   subcommands=True)
+        section.should.equal('sec2')
+        Config['sec2'].key3.should.equal('sub3')
+        len(Config._cli_parsers).should.equal(2)
+        Config.register_config('test', 'sec1', key1=BoolConfigOption())
+        Config.parse_cli(args=['--key1'])
+        Config['sec1'].key1.should.be.ok
+        len(Config._cli_parsers).should.equal(3)
+
+    def env(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+        Config.register_config('test', 'sec-2', key3=3)
+        environ = dict(APP_SEC1_KEY1='env1', APP_SEC1_KEY2='a,b',
+                       APP_SEC_2_KEY3='4', OTHER_KEY4='other')
+        version = Config.snapshot('sec1').version
+        Config.set_env_config('app_', environ=environ)
+        Config['sec1'].key1.should.equal('env1')
+        Config['sec1'].key2.should.equal(['a', 'b'])
+        Config['sec-2'].key3.should.equal(4)
+        Config.snapshot('sec1').version.should.equal(version + 1)
+        Config.parse_cli(args=['--key1', 'cli1'])
+        Config['sec1'].key1.should.equal('cli1')
+        Config.set_env_config(sections={'sec3': 'OTHER_'}, environ=environ)
+        Config.register_config('test', 'sec3', key4='val4')
+        Config['sec3'].key4.should.equal('other')
+        Config['sec-2'].key3.should.equal(3)
+
+    def instrument(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1', key2='val2')
+        Config['sec1'].key1
+        (Config.stats_report() is None).should.be.ok
+        Config.instrument(sample_rate=2)
+        try:
+            for i in range(4):
+                Config['sec1'].key1
+            Config['sec1'].key2
+            Config.override('sec1', key2='new2')
+            Config['sec1'].key2
+            report = Config.stats_report()
+        finally:
+            Config.stop_instrumenting()
+        reads = report['reads']
+        [(e['key'], e['reads'], e['samples']) for e in reads].should.equal(
+            [('key1', 4, 2), ('key2', 2, 1)])
+        report['updates']['sec1']['count'].should.equal(1)
+        report['resolves']['sec1']['count'].should.equal(1)
+        (Config.stats_report() is None).should.be.ok
+
+    def pending_clients(self):
+        Config.clear()
+        clients = [ConfigClient('sec1') for i in range(3)]
+        del clients[1:]
+        gc.collect()
+        len(Config._pending_clients['sec1']).should.equal(1)
+        Config.set_cli_config(Namespace(key1='cli1'))
+        Config.register_config('test', 'sec1', key1='val1')
+        clients[0]('key1').should.equal('cli1')
+        Config._pending_clients.should.equal({})
+
+    def scoped_override(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+
+        @configurable(sec1=['key1'])
+        class Lazy(object):
+            pass
+        lazy = Lazy()
+        conf = ConfigClient('sec1')
+        lazy._key1.should.equal('val1')
+        version = Config.snapshot('sec1').version
+        seen = []
+        with Config.scoped_override('sec1', key1='val2', key2='jkl;,qwer'):
+            thread = threading.Thread(
+                target=lambda: seen.append(Config['sec1'].key1))
+            thread.start()
+            thread.join()
+            conf('key1').should.equal('val2')
+            conf('key2').should.equal(['jkl;', 'qwer'])
+            lazy._key1.should.equal('val2')
+            with Config.scoped_override('sec1', key1='val3'):
+                Config['sec1'].key1.should.equal('val3')
+                Config['sec1'].key2.should.equal(['jkl;', 'qwer'])
+            Config['sec1'].key1.should.equal('val2')
+        seen.should.equal(['val1'])
+        lazy._key1.should.equal('val1')
+        conf('key2').should.equal(['asdf'])
+        Config.snapshot('sec1').version.should.equal(version)
+
+    def restore_state(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1')
+
+        @configurable(sec1=['key1'])
+        class Reader(object):
+            pass
+        reader = Reader()
+        state = Config.save_state()
+        Config.override('sec1', key1='val2')
+        Config.register_config('test', 'sec2', key2='val2')
+        reader._key1.should.equal('val2')
+        Config.restore_state(state)
+        Config['sec1'].key1.should.equal('val1')
+        reader._key1.should.equal('val1')
+        sec2 = lambda: Config['sec2']
+        sec2.when.called_with().should.throw(NoSuchSectionError)
+
+    def export_state(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1='val1',
+                               key2=ListConfigOption(['asdf']))
+        Config.override('sec1', key2='jkl;,qwer')
+        data = Config.export_state()
+        Config.clear()
+        Config.import_state(data)
+        Config['sec1'].key1.should.equal('val1')
+        Config['sec1'].key2.should.equal(['jkl;', 'qwer'])
+
+    def accessor(self):
+        Config.clear()
+        Config.register_config('test', 'sec1', key1=ListConfigOption(
+            ['1', '2'], element_type=int))
+        value = Config['sec1'].key1
+        value.should.equal([1, 2])
+        (Config['sec1'].key1 is value).should.be.ok
+        (Config['sec1'] is Config['sec1']).should.be.ok
+        Config.override('sec1', key1='3')
+        Config['sec1'].key1.should.equal([3])
+
+    def option_type(self):
+        class Version(object):
+
+            def __init__(self, text):
+                self.parts = tuple(map(int, text.split('.')))
+
+        class SemVer(Version):
+            pass
+
+        class VersionConfigOption(TypedConfigOption):
+
+            def __init__(self, default):
+                super().__init__(Version, default)
+        register_option_type(Version, VersionConfigOption)
+        Config.clear()
+        Config.register_config('test', 'sec1', key1=SemVer('1.2'), key2=3)
+        Config.override('sec1', key1='2.0', key2='4')
+        Config['sec1'].key1.parts.should.equal((2, 0))
+        Config['sec1'].key2.should.equal(4)
+
+    def option_meta(self):
+        option = ListConfigOption('1,2', element_type=int, help='ints')
+        other = copy.copy(option)
+        other.set('3')
+        option.effective_value.should.equal([1, 2])
+        other.effective_value.should.equal([3])
+        (other._meta is option._meta).should.be.ok
+        other.short = 'l'
+        (option.short is None).should.be.ok
+        other.help.should.equal('ints')
+        hasattr(option, '__dict__').should_not.be.ok
+
+    def parse_cache(self):
+        parse_cache.clear()
+        value = DictConfigOption('1:foo,2:boo', key_type=int)
+        DictConfigOption('1:foo,2:boo', key_type=int).value.should.equal(
+            value.value)
+        DictConfigOption('1:foo,2:boo').value.should.equal(
+            {'1': 'foo', '2': 'boo'})
+        parse_cache.stats['hits'].should.equal(1)
+        parse_cache.stats['misses'].should.equal(2)
+
+    def parse_cache_copies(self):
+        parse_cache.clear()
+        ListConfigOption('a,b').value.append('c')
+        ListConfigOption('a,b').value.should.equal(['a', 'b'])
+        DictConfigOption('x:1').value['y'] = '2'
+        DictConfigOption('x:1').value.should.equal({'x': '1'})
+        parse_cache.stats['hits'].should.equal(2)
+
+    def path_list(self):
+        for name in ['a.conf', 'b.conf', 'c.txt']:
+            temp_file('paths', name).touch()
+        pattern = '{},{}'.format(temp_file('paths', '*.conf'),
+                                 temp_file('paths', 'c.txt'))
+        paths = PathListConfigOption(pattern)
+        names = lambda: sorted(p.name for p in paths.effective_value)
+        names().should.equal(['a.conf', 'b.conf', 'c.txt'])
+        temp_file('paths', 'd.conf').touch()
+        names().should.equal(['a.conf', 'b.conf', 'c.txt', 'd.conf'])
+
+    def path_environment(self):
+        os.environ['TEK_TEST_PATH'] = '/first'
+        PathConfigOption('$TEK_TEST_PATH/a').value.should.equal(
+            Path('/first/a'))
+        PathListConfigOption('$TEK_TEST_PATH/b').value.should.equal(
+            [Path('/first/b')])
+        os.environ['TEK_TEST_PATH'] = '/second'
+        PathConfigOption('$TEK_TEST_PATH/a').value.should.equal(
+            Path('/second/a'))
+        PathListConfigOption('$TEK_TEST_PATH/b').value.should.equal(
+            [Path('/second/b')])
+        option = lambda: ListConfigOption('$TEK_TEST_PATH/c',
+                                          element_type=PathConfigOption)
+        option().effective_value.should.equal([Path('/second/c')])
+        os.environ['TEK_TEST_PATH'] = '/third'
+        option().effective_value.should.equal([Path('/third/c')])
+        del os.environ['TEK_TEST_PATH']
+
     def autoload(self):
         Config.allow_files = True
         sys.path.insert(0, fixture_path('config'))
@@ -69,6 +379,175 @@ class Config_(Spec):
         invalid_option = lambda: Config['sec1'].inval
         invalid_option.when.called_with().should.throw(NoSuchOptionError)
 
+    def cache(self):
+        Config.allow_files = True
+        sys.path.insert(0, fixture_path('config'))
+        Config.cache_file = str(temp_file('config', 'cache'))
+        try:
+            Config.setup('mod1', 'mod3')
+            Config.setup('mod1', 'mod3')
+        finally:
+            Config.cache_file = None
+        isinstance(Config.metadata['mod1']['func'],
+                   functools.partial).should.be.ok
+        Config['sec1'].key1.should.equal('success')
+        Config['sec2'].key1.should.equal('val1')
+
+    def cache_key(self):
+        from tek.config import cache
+        home = os.environ.get('XDG_CONFIG_HOME')
+        try:
+            os.environ['XDG_CONFIG_HOME'] = '/first'
+            key = cache._key(Config, ['mod1'], True)
+            os.environ['XDG_CONFIG_HOME'] = '/second'
+            (cache._key(Config, ['mod1'], True) == key).should_not.be.ok
+        finally:
+            if home is None:
+                del os.environ['XDG_CONFIG_HOME']
+            else:
+                os.environ['XDG_CONFIG_HOME'] = home
+
+    def shared_files(self):
+        from tek.config.files import _parsed_files
+        Config.allow_files = True
+        Config.clear()
+        conf_file = str(fixture_path('config', 'mod1', 'mod1.conf'))
+        Config.register_files('alias1', conf_file)
+        Config.register_files('alias2', conf_file)
+        Config.register_files('alias2', conf_file)
+        Config._factories['alias2'].files.should.equal([conf_file])
+        _parsed_files.should.contain(conf_file)
+        Config.register_config('alias2', 'sec1', key1='val1')
+        Config['sec1'].key1.should.equal('success')
+
+    def spec_files(self):
+        home = os.environ.get('XDG_CONFIG_HOME')
+        conf_dir = tempfile.mkdtemp()
+        conf_file = os.path.join(conf_dir, 'tek.conf')
+
+        def setup(verbose):
+            with open(conf_file, 'w') as f:
+                f.write('[general]\nverbose = {}\n'.format(verbose))
+            Spec().setup(allow_files=True)
+            return Config['general'].verbose
+        try:
+            os.environ['XDG_CONFIG_HOME'] = conf_dir
+            setup('true').should.be.ok
+            setup('false').should_not.be.ok
+        finally:
+            if home is None:
+                del os.environ['XDG_CONFIG_HOME']
+            else:
+                os.environ['XDG_CONFIG_HOME'] = home
+            shutil.rmtree(conf_dir)
+
+    def invalid_files(self):
+        conf_file = temp_file('config', 'invalid.conf')
+        with conf_file.open('w') as f:
+            f.write('[sec1]\nkey1 = 100%\n[sec2]\nkey2 = file2\n')
+        Config.allow_files = True
+        Config.clear()
+        Config.register_files('test', str(temp_dir('config')),
+                              str(conf_file))
+        Config.register_config('test', 'sec1', key1='val1')
+        Config.register_config('test', 'sec2', key2='val2')
+        Config['sec1'].key1.should.equal('val1')
+        Config['sec2'].key2.should.equal('file2')
+
+    def reload(self):
+        conf_file = temp_file('config', 'reload.conf')
+        with conf_file.open('w') as f:
+            f.write('[sec1]\nkey1 = file1\n')
+        Config.allow_files = True
+        Config.clear()
+        Config.register_files('test', str(conf_file))
+        Config.register_config('test', 'sec1', key1='val1', key2='val2')
+
+        @configurable(sec1=['key1', 'key2'])
+        class Reader(object):
+            pass
+        reader = Reader()
+        reader._key1.should.equal('file1')
+        reader._sec1__key2.should.equal('val2')
+        with conf_file.open('w') as f:
+            f.write('[sec1]\nkey2 = file2\n')
+        Config.reload().should.equal({'sec1': set(['key1', 'key2'])})
+        reader._key1.should.equal('val1')
+        reader._sec1__key2.should.equal('file2')
+        Config.reload().should.equal({})
+
+    def reload_on_signal(self):
+        from tek.run import SignalManager
+        conf_file = temp_file('config', 'signal.conf')
+        with conf_file.open('w') as f:
+            f.write('[sec1]\nkey1 = file1\n')
+        Config.allow_files = True
+        Config.clear()
+        Config.register_files('test', str(conf_file))
+        Config.register_config('test', 'sec1', key1='val1')
+        handler = Config.reload_on_signal(signal.SIGUSR2)
+        try:
+            with conf_file.open('w') as f:
+                f.write('[sec1]\nkey1 = file2\n')
+
+            def fail():
+                with Config.batch():
+                    handler(signal.SIGUSR2, None)
+                    time.sleep(0.1)
+                    Config['sec1'].key1.should.equal('file1')
+                    raise ValueError()
+            fail.when.called_with().should.throw(ValueError)
+            later(lambda: Config['sec1'].key1.should.equal('file2'))
+        finally:
+            SignalManager.instance.remove(handler)
+
+    def parallel_setup(self):
+        Config.allow_files = True
+        sys.path.insert(0, fixture_path('config'))
+        Config.setup_workers = 4
+        try:
+            Config.setup('mod1', 'mod3')
+        finally:
+            Config.setup_workers = None
+        Config['sec1'].key1.should.equal('success')
+        Config['sec2'].key1.should.equal('val1')
+        levels = [[m['name'] for m in level]
+                  for level in Config.dependency_levels()]
+        levels.should.equal([['tek'], ['mod1'], ['mod2'], ['mod3']])
+
+    def parallel_order(self):
+        def slow():
+            time.sleep(0.1)
+            Config.register_config('a', 'seca', key1='val1')
+            return {'secc': {'key3': 'val3'}}
+
+        def fast():
+            Config.register_config('b', 'secb', key2='val2')
+        Config.clear_metadata()
+        for name, func in [('a', slow), ('b', fast)]:
+            Config.metadata[name] = dict(parents=[], alias=name, name=name,
+                                         func=func, files=[],
+                                         std_files=False)
+        Config.setup_workers = 4
+        try:
+            Config.reset(files=False)
+        finally:
+            Config.setup_workers = None
+        list(Config._configs).should.equal(['seca', 'secc', 'secb'])
+
+    def circular(self):
+        Config.clear_metadata()
+        deps = dict(a=['d', 'b'], b=['c'], c=['a'], d=[])
+        for name, parents in deps.items():
+            Config.metadata[name] = dict(parents=parents, alias=name,
+                                         name=name)
+        try:
+            list(Config.order_dependencies())
+        except ConfigLoadError as e:
+            str(e).should.equal('Circular dependencies: a -> b -> c -> a!')
+        else:
+            raise AssertionError('no ConfigLoadError')
+
     def write(self):
         outfile = temp_file('config', 'outfile.conf')
         write_pkg_config(fixture_path('config'), outfile, 'mod2')
@@ -76,6 +555,14 @@ class Config_(Spec):
             lines = _file.readlines()
             lines.should.equal(['[sec2]\n', '# key1 = val0\n', '\n'])
 
+    def write_static(self):
+        outfile = temp_file('config', 'static.conf')
+        write_pkg_config(fixture_path('config'), outfile, 'mod2',
+                         static=True)
+        with open(outfile) as _file:
+            lines = _file.readlines()
+            lines.should.equal(['[sec2]\n', '# key1 = val0\n', '\n'])
+
     def cli(self):
         from tests._fixtures.config.mod1.sub.cli import cli_test
         data = []
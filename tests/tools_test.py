@@ -1,11 +1,35 @@
 import sure  #NOQA
 
-from tek.tools import sizeof_fmt
+from tek.tools import sizeof_fmt, parallel_map, iparallel_map
 from tek.test import Spec
 
 
+def _fail(value):
+    if value == 5:
+        raise ValueError(value)
+    return value
+
+
 class Tools_(Spec):
 
     def sizeof_fmt(self):
         sizeof_fmt(1450000, prec=3, bi=False).should.equal('1.450 MB')
         sizeof_fmt(1450000, bi=True).should.equal('1.4 MB')
+
+    def parallel_map(self):
+        values = list(range(100))
+        parallel_map(pow, values, values, workers=4, chunksize=7).should.equal(
+            [pow(v, v) for v in values])
+        unordered = iparallel_map(abs, values, workers=3, ordered=False)
+        sorted(unordered).should.equal(values)
+        parallel_map(abs, values[:10], processes=True,
+                     workers=2).should.equal(values[:10])
+        fail = lambda: parallel_map(_fail, values, workers=4)
+        fail.should.throw(ValueError)
+
+    def parallel_map_close(self):
+        calls = []
+        results = iparallel_map(calls.append, range(100), workers=1)
+        next(results)
+        results.close()
+        (len(calls) < 5).should.be.ok
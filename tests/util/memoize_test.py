@@ -0,0 +1,232 @@
+import gc
+import time
+import asyncio
+import threading
+
+import sure  # NOQA
+
+from tek.test import Spec, temp_file
+from tek.tools import memoized, memoized_class
+from tek.util.memoize import MemoCache, memoize, memo_cache
+from tek.util.disk_memoize import DiskMemoCache, function_version
+
+import tests  # NOQA
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class _Specimen(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @memoized
+    def double(self, value):
+        self.calls += 1
+        return 2 * value
+
+    @memoized_class
+    def triple(self, value):
+        self.calls += 1
+        return 3 * value
+
+    @memoized_class(weak=True)
+    def size(self, owner, factor=1):
+        self.calls += 1
+        return len(owner) * factor
+
+
+class _AsyncSpecimen(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    @memoized(maxsize=2)
+    async def fetch(self, value):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if value < 0:
+            raise ValueError(value)
+        return value
+
+
+class _Owner(list):
+    pass
+
+
+class Memoize_(Spec):
+
+    def eviction(self):
+        clock = _Clock()
+        cache = MemoCache(maxsize=2, ttl=10, clock=clock)
+        cache.get(1, lambda: 'a')
+        cache.get(2, lambda: 'b')
+        cache.get(1, lambda: 'x').should.equal('a')
+        cache.get(3, lambda: 'c')
+        (2 in cache).should_not.be.ok
+        (1 in cache).should.be.ok
+        clock.now = 11
+        cache.get(1, lambda: 'd').should.equal('d')
+        cache.stats.should.equal(dict(hits=1, misses=4, evictions=2,
+                                      coalesced=0, size=2, maxsize=2))
+        cache.clear()
+        len(cache).should.equal(0)
+
+    def keys(self):
+        @memoize
+        def args(*a, **kw):
+            return a, kw
+        args(x=1).should.equal(((), dict(x=1)))
+        args((), (('x', 1),)).should.equal((((), (('x', 1),)), dict()))
+        args(1, x=2).should.equal(((1,), dict(x=2)))
+        args(1, ('x', 2)).should.equal(((1, ('x', 2)), dict()))
+
+    def single_flight(self):
+        calls = []
+
+        @memoize
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.05)
+            return value
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow(1)))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        calls.should.equal([1])
+        results.should.equal([1] * 4)
+        stats = slow.cache.stats
+        (stats['coalesced'] + stats['hits']).should.equal(3)
+
+    def failure(self):
+        calls = []
+
+        @memoize(maxsize=4)
+        def fail(value):
+            calls.append(value)
+            raise ValueError(value)
+        (lambda: fail(1)).should.throw(ValueError)
+        (lambda: fail(1)).should.throw(ValueError)
+        len(calls).should.equal(2)
+
+    def methods(self):
+        one, two = _Specimen(), _Specimen()
+        one.double(2).should.equal(4)
+        one.double(2).should.equal(4)
+        two.double(2).should.equal(4)
+        one.calls.should.equal(1)
+        two.calls.should.equal(1)
+        memo_cache(one, _Specimen.double).stats['hits'].should.equal(1)
+        one.triple(value=2).should.equal(6)
+        two.triple(value=2).should.equal(6)
+        (one.calls + two.calls).should.equal(3)
+        _Specimen.triple.cache.clear()
+        _Specimen.triple.cache.maxsize.should.equal(1024)
+
+    def weak_owner(self):
+        specimen = _Specimen()
+        owner = _Owner([1, 2])
+        specimen.size(owner).should.equal(2)
+        specimen.size(owner).should.equal(2)
+        specimen.size(owner, factor=2).should.equal(4)
+        specimen.size('abc').should.equal(3)
+        specimen.calls.should.equal(3)
+        cache = _Specimen.size.cache
+        len(cache).should.equal(1)
+        del owner
+        gc.collect()
+        len(cache).should.equal(0)
+        cache.stats['hits'].should.equal(0)
+        cache.stats['size'].should.equal(1)
+
+    def plain_owner(self):
+        specimen = _Specimen()
+        _Specimen.size.cache.clear()
+        owner = [1, 2]
+        specimen.size(owner).should.equal(2)
+        owner.append(3)
+        specimen.size(owner).should.equal(3)
+        specimen.calls.should.equal(2)
+        len(_Specimen.size.cache).should.equal(0)
+        _Specimen.size.cache.stats['size'].should.equal(0)
+
+    def coroutine(self):
+        specimen = _AsyncSpecimen()
+
+        async def run():
+            results = await asyncio.gather(*[specimen.fetch(1)
+                                             for i in range(5)])
+            results.should.equal([1] * 5)
+            specimen.calls.should.equal(1)
+            (await specimen.fetch(1)).should.equal(1)
+            specimen.calls.should.equal(1)
+            for i in range(2):
+                try:
+                    await specimen.fetch(-1)
+                except ValueError:
+                    pass
+            specimen.calls.should.equal(3)
+            stats = memo_cache(specimen, _AsyncSpecimen.fetch).stats
+            stats['coalesced'].should.equal(4)
+            stats['hits'].should.equal(1)
+        asyncio.run(run())
+
+    def persistent(self):
+        path = temp_file('memoize', 'memoize.sqlite')
+        if path.exists():
+            path.unlink()
+        calls = []
+
+        def square(value):
+            calls.append(value)
+            return value * value
+        version = function_version(square, 1)
+
+        def cache(**kw):
+            return DiskMemoCache(version, path=str(path), **kw)
+        first = cache(maxsize=2)
+        first.get((2,), lambda: square(2)).should.equal(4)
+        first.get((3,), lambda: square(3)).should.equal(9)
+        cache().get((2,), lambda: square(2)).should.equal(4)
+        calls.should.equal([2, 3])
+        first.get((4,), lambda: square(4))
+        len(first).should.equal(2)
+        first.evictions.should.equal(1)
+        (function_version(square, 2) == version).should_not.be.ok
+        other = DiskMemoCache(function_version(square, 2), path=str(path))
+        other.get((2,), lambda: square(2))
+        calls.should.equal([2, 3, 4, 2])
+        first.clear()
+        len(first).should.equal(0)
+        len(other).should.equal(1)
+
+    def persistent_version(self):
+        def define():
+            def squares(values):
+                return [value * value for value in values]
+            return squares
+        (function_version(define(), 1) ==
+         function_version(define(), 1)).should.be.ok
+
+    def persistent_corrupt(self):
+        path = temp_file('memoize', 'corrupt.sqlite')
+        if path.exists():
+            path.unlink()
+        cache = DiskMemoCache('corrupt', path=str(path))
+        cache.get((2,), lambda: 4).should.equal(4)
+        with cache._db as db:
+            db.execute('update memo set value = ?', (b'invalid',))
+        cache.get((2,), lambda: 5).should.equal(5)
+        cache.get((2,), lambda: 6).should.equal(5)
+        len(cache).should.equal(1)